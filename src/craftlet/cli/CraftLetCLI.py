@@ -1,15 +1,13 @@
-import asyncio
-import sys
 from pathlib import Path
 
 import typer
 
-from craftlet.features.CraftLet import CraftLet
 from craftlet.features.CraftLetCache import CraftLetCache
 from craftlet.models.Cacheable import GithubTemplate, GithubTemplateReference
 from craftlet.utils.exceptions import CraftLetException
-from craftlet.utils.helperFunctions import CacheFunction
 
+# Feature modules pull in httpx, rich, readchar and asyncio, so commands import
+# them on demand to keep `--help` and lightweight commands fast to start.
 craftletCliApp = typer.Typer()
 
 
@@ -17,27 +15,133 @@ craftletCliApp = typer.Typer()
 def load_template(
     github: bool = typer.Option(default=False, help="Load Template From GitHub thorugh GitHub repo URL"),
     local: bool = typer.Option(default=False, help="Load Template From Local Cache"),
-    local_profile: str = typer.Argument(default=None, help="Load Template From Online Profile Cache"),
+    local_profile: str = typer.Argument(default=None, help="Load Template From a synced Profile Cache"),
+    template: str = typer.Option(default=None, help="Alias of the template to load from LOCAL_PROFILE"),
     generate_env: bool = typer.Option(
         default=False, help="Is Yes then it will environment variable file(.env)"
     ),
+    ref: str = typer.Option(
+        default=None,
+        help="Branch, tag or commit SHA of the template to load (default: main, or the ref a cached reference was saved with)",
+    ),
+    pipelined: bool = typer.Option(
+        default=False, help="Write files to disk while the GitHub tarball is still downloading"
+    ),
+    mirror: str = typer.Option(
+        default=None, envvar="CRAFTLET_CACHE_MIRROR", help="URL of a craftlet serve-cache mirror to try before GitHub"
+    ),
+    prefetch_refs: bool = typer.Option(
+        default=False, help="Afterwards, download every cached template reference in a background process"
+    ),
+    durable: bool = typer.Option(
+        default=False, help="fsync the project files (batched per directory) before it is moved into place"
+    ),
 ):
+    import asyncio
+
+    configureCacheMirror(mirrorUrl=mirror)
+
     if github:
-        asyncio.run(loadTemplateFromGithub(generateEnv=generate_env))
-    elif local:
-        loadTemplateFromLocal(generateEnv=generate_env, localProfile=local_profile)
+        asyncio.run(
+            loadTemplateFromGithub(generateEnv=generate_env, ref=ref or "main", pipelined=pipelined, durable=durable)
+        )
+    elif local or local_profile is not None:
+        loadTemplateFromLocal(
+            generateEnv=generate_env, localProfile=local_profile, ref=ref, templateAlias=template, durable=durable
+        )
+    else:
+        asyncio.run(
+            loadTemplateFromGithub(generateEnv=generate_env, ref=ref or "main", pipelined=pipelined, durable=durable)
+        )
+    if prefetch_refs:
+        startBackgroundPrefetch(mirrorUrl=mirror)
+
+
+@craftletCliApp.command()
+def sync_profile(
+    profile_name: str = typer.Argument(help="Name of the profile to sync"),
+    manifest: Path = typer.Option(default=None, help="Profile manifest (JSON) to store for this profile before syncing"),
+    mirror: str = typer.Option(
+        default=None, envvar="CRAFTLET_CACHE_MIRROR", help="URL of a craftlet serve-cache mirror to try before GitHub"
+    ),
+):
+    import asyncio
+
+    from craftlet.features.ProfileCache import ProfileCache
+
+    configureCacheMirror(mirrorUrl=mirror)
+    asyncio.run(ProfileCache.syncProfile(profileName=profile_name, manifestPath=manifest))
+    typer.echo(f"✅ Profile {profile_name} is synced")
+
+
+@craftletCliApp.command()
+def update(
+    project_dir: Path = typer.Argument(default=Path("."), help="Project created by load-template to update"),
+    ref: str = typer.Option(default=None, help="Branch, tag or commit SHA to update to (default: the recorded ref)"),
+    template_url: str = typer.Option(default=None, help="Template repo URL, needed for projects loaded with --local"),
+    dry_run: bool = typer.Option(default=False, help="Only report what would change"),
+    mirror: str = typer.Option(
+        default=None, envvar="CRAFTLET_CACHE_MIRROR", help="URL of a craftlet serve-cache mirror to try before GitHub"
+    ),
+):
+    import asyncio
+
+    from craftlet.features.ProjectUpdate import ProjectUpdate
+
+    configureCacheMirror(mirrorUrl=mirror)
+    projectDir = project_dir.resolve()
+    commitSha, report = asyncio.run(
+        ProjectUpdate.updateProject(projectDir=projectDir, ref=ref, templateUrl=template_url, dryRun=dry_run)
+    )
+    ProjectUpdate.printReport(projectDir=projectDir, commitSha=commitSha, report=report, dryRun=dry_run)
+
+
+@craftletCliApp.command()
+def snapshot_graph(
+    output: Path = typer.Argument(help="File to write the dependency graph snapshot (CBOR) to"),
+    project_root: Path = typer.Option(default=Path("."), help="Root of the project to analyse"),
+):
+    from craftlet.features.DependencyGraphSnapshot import DependencyGraphSnapshot
+
+    edges = DependencyGraphSnapshot.capture(projectRootPath=project_root)
+    DependencyGraphSnapshot.save(snapshotPath=output, edges=edges)
+    typer.echo(f"✅ Wrote {len(edges)} dependency edges to {output}")
+
+
+@craftletCliApp.command()
+def diff_graph(
+    baseline: Path = typer.Argument(help="Stored dependency graph snapshot to compare against"),
+    current: Path = typer.Option(default=None, help="Snapshot to compare, instead of analysing --project-root"),
+    project_root: Path = typer.Option(default=Path("."), help="Root of the project to analyse"),
+    fail_on_cycles: bool = typer.Option(default=False, help="Exit with code 1 when new import cycles appear"),
+):
+    from craftlet.features.DependencyGraphSnapshot import DependencyGraphSnapshot
+
+    baselineEdges = DependencyGraphSnapshot.load(snapshotPath=baseline)
+    if current is not None:
+        currentEdges = DependencyGraphSnapshot.load(snapshotPath=current)
     else:
-        asyncio.run(loadTemplateFromGithub(generateEnv=generate_env))
+        currentEdges = DependencyGraphSnapshot.capture(projectRootPath=project_root)
+    graphDiff = DependencyGraphSnapshot.diff(baselineEdges=baselineEdges, currentEdges=currentEdges)
+    for importer, imported in graphDiff.addedEdges:
+        typer.echo(f"  + {importer} -> {imported}")
+    for importer, imported in graphDiff.removedEdges:
+        typer.echo(f"  - {importer} -> {imported}")
+    for cycle in graphDiff.newCycles:
+        typer.echo(f"  ! new cycle: {', '.join(cycle)}")
+    typer.echo(
+        f"{len(graphDiff.addedEdges)} added, {len(graphDiff.removedEdges)} removed, "
+        f"{len(graphDiff.newCycles)} new cycles"
+    )
+    if fail_on_cycles and graphDiff.newCycles:
+        raise typer.Exit(code=1)
 
 
 @craftletCliApp.command()
 def show_cache(
     specific_folder: str = typer.Argument(help="Give the relative folder path you want to see", default=""),
 ):
-    if CraftLetCache.isRunningInEnvironment():
-        exactPath = Path(sys.prefix) / "craftlet" / ".cache" / specific_folder
-    else:
-        exactPath = CacheFunction.getOSCacheDir() / "craftlet" / ".cache" / specific_folder
+    exactPath = CraftLetCache.getCacheBasePath() / "craftlet" / ".cache" / specific_folder
     CraftLetCache.showCache(cacheDir=exactPath)
 
 
@@ -50,7 +154,12 @@ def cache_template(
         default=False,
         help="True: Only cache reference, False: Cache whole template",
     ),
+    ref: str = typer.Option(default="main", help="Branch, tag or commit SHA of the template to cache"),
+    mirror: str = typer.Option(
+        default=None, envvar="CRAFTLET_CACHE_MIRROR", help="URL of a craftlet serve-cache mirror to try before GitHub"
+    ),
 ):
+    configureCacheMirror(mirrorUrl=mirror)
     templatePlatform, templateOwner, templateName = template_url[8:].split("/")
     match templatePlatform:
         case "github.com":
@@ -58,18 +167,30 @@ def cache_template(
                 cacheableData = GithubTemplateReference(
                     name=templateName,
                     coreData=template_url,
-                    payload={"ownerName": templateOwner},
+                    payload={"ownerName": templateOwner, "ref": ref},
                 )
             else:
+                import asyncio
+
                 try:
                     loop = asyncio.get_running_loop()
                 except RuntimeError:
-                    templateBytes = asyncio.run(CraftLet.getTemplateBytesGithub(template_url))
+                    commitSha, templateBytes, cacheStatus = asyncio.run(
+                        CraftLetCache.fetchGithubTemplateForCache(
+                            templateUrl=template_url, templateName=templateName, ref=ref
+                        )
+                    )
                 else:
                     future = asyncio.run_coroutine_threadsafe(
-                        CraftLet.getTemplateBytesGithub(template_url), loop
+                        CraftLetCache.fetchGithubTemplateForCache(
+                            templateUrl=template_url, templateName=templateName, ref=ref
+                        ),
+                        loop,
                     )
-                    templateBytes = future.result()
+                    commitSha, templateBytes, cacheStatus = future.result()
+                if templateBytes is None:
+                    typer.echo(f"Template {templateName}@{commitSha} {cacheStatus}")
+                    return
                 cacheableData = GithubTemplate(
                     name=templateName,
                     coreData=templateBytes,
@@ -77,55 +198,177 @@ def cache_template(
                     payload={
                         "ownerName": templateOwner,
                         "template_url": template_url,
+                        "ref": ref,
+                        "commitSha": commitSha,
                     },
                 )
-            if CraftLetCache.isRunningInEnvironment():
-                CraftLetCache.cacheOffline(path=Path(sys.prefix), data=cacheableData)
-            else:
-                CraftLetCache.cacheOffline(path=CacheFunction.getOSCacheDir(), data=cacheableData)
+            CraftLetCache.cacheOffline(path=CraftLetCache.getCacheBasePath(), data=cacheableData)
         case _:
             raise CraftLetException(f"Unrecognized platform({templatePlatform})")
 
 
-async def loadTemplateFromGithub(generateEnv: bool):
+@craftletCliApp.command()
+def prefetch_refs(
+    concurrency: int = typer.Option(default=4, help="How many references to download at the same time"),
+    mirror: str = typer.Option(
+        default=None, envvar="CRAFTLET_CACHE_MIRROR", help="URL of a craftlet serve-cache mirror to try before GitHub"
+    ),
+):
+    import asyncio
+
+    configureCacheMirror(mirrorUrl=mirror)
+    results = asyncio.run(
+        CraftLetCache.prefetchGithubTemplateReferences(path=CraftLetCache.getCacheBasePath(), concurrency=concurrency)
+    )
+    failures = 0
+    for templateName, result in results.items():
+        if isinstance(result, BaseException):
+            failures += 1
+            typer.echo(f"  ! {templateName}: {result}")
+        else:
+            typer.echo(f"  + {templateName} -> {result.name if result else 'missing'}")
+    typer.echo(f"✅ Prefetched {len(results) - failures}/{len(results)} template references")
+    if failures:
+        raise typer.Exit(code=1)
+
+
+def startBackgroundPrefetch(mirrorUrl: str | None):
+    import subprocess
+    import sys
+
+    # A detached process keeps warming the cache after this command has returned
+    command = [sys.executable, "-m", "craftlet.main", "prefetch-refs"]
+    if mirrorUrl:
+        command.extend(["--mirror", mirrorUrl])
+    subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+@craftletCliApp.command()
+def serve_cache(
+    host: str = typer.Option(default="127.0.0.1", help="Interface to listen on"),
+    port: int = typer.Option(default=8750, help="Port to listen on"),
+):
+    import asyncio
+
+    from craftlet.features.CacheMirror import CacheMirrorServer
+
+    cacheRoot = CraftLetCache.getCacheBasePath() / "craftlet" / ".cache"
+    try:
+        asyncio.run(CacheMirrorServer(cacheRoot=cacheRoot, host=host, port=port).serve())
+    except KeyboardInterrupt:
+        typer.echo("Cache mirror stopped")
+
+
+def configureCacheMirror(mirrorUrl: str | None):
+    if mirrorUrl:
+        from craftlet.features.CacheMirror import CacheMirrorClient
+
+        CacheMirrorClient.mirrorUrl = mirrorUrl
+
+
+async def loadTemplateFromGithub(generateEnv: bool, ref: str, pipelined: bool = False, durable: bool = False):
+    from craftlet.features.CraftLet import CraftLet
+    from craftlet.models.ProjectManifest import ProjectManifest
+    from craftlet.utils.mappers import repoUrlToOwnerAndName
+
     templateUrl = typer.prompt(text="Enter Github Template Repo URL: ")
     projectName = typer.prompt(text="Enter The Project Name")
+    _, templateName = repoUrlToOwnerAndName(repoUrl=templateUrl)
+    commitSha = await CraftLet.resolveGithubRef(repoUrl=templateUrl, ref=ref)
+    manifest = ProjectManifest(templateUrl=templateUrl, ref=ref, commitSha=commitSha)
+    cachedTemplatePath = CraftLetCache.getCachedGithubTemplate(
+        path=CraftLetCache.getCacheBasePath(), templateName=templateName, commitSha=commitSha
+    )
+    if cachedTemplatePath is not None:
+        CraftLet.loadTemplateLocal(
+            templatePath=cachedTemplatePath,
+            targetDestination=Path.cwd() / projectName,
+            generateEnv=generateEnv,
+            manifest=manifest,
+            durable=durable,
+        )
+        return
     await CraftLet.loadTemplateGithub(
         repoUrl=templateUrl,
         targetDir=Path.cwd() / projectName,
         generateEnv=generateEnv,
+        ref=commitSha,
+        pipelined=pipelined,
+        manifest=manifest,
+        durable=durable,
     )
 
 
-def loadTemplateFromLocal(generateEnv: bool, localProfile: str | None):
-    templateSource = typer.prompt("Enter the source of template: ")
-    templateName = typer.prompt(text="Enter The name of the template: ")
-    projectName = typer.prompt(text="Enter The Project Name: ")
+def loadTemplateFromLocal(
+    generateEnv: bool,
+    localProfile: str | None,
+    ref: str | None,
+    templateAlias: str | None = None,
+    durable: bool = False,
+):
+    from craftlet.features.CraftLet import CraftLet
+    from craftlet.models.ProjectManifest import ProjectManifest
+    from craftlet.utils.helperFunctions import GitFunction
+
     if localProfile is None:
-        if CraftLetCache.isRunningInEnvironment():
-            exactPath = (
-                Path(sys.prefix)
-                / "craftlet"
-                / ".cache"
-                / "offline"
-                / "template"
-                / templateSource
-                / templateName
-            )
-        else:
-            exactPath = (
-                CacheFunction.getOSCacheDir()
-                / "craftlet"
-                / ".cache"
-                / "offline"
-                / "template"
-                / templateSource
-                / templateName
+        templateSource = typer.prompt("Enter the source of template: ")
+        templateName = typer.prompt(text="Enter The name of the template: ")
+        projectName = typer.prompt(text="Enter The Project Name: ")
+        templateDir = (
+            CraftLetCache.getCacheBasePath()
+            / "craftlet"
+            / ".cache"
+            / "offline"
+            / "template"
+            / templateSource
+            / templateName
+        )
+        exactPath = CraftLetCache.resolveCachedTemplateRef(templateDir=templateDir, ref=ref)
+        # The offline cache does not know the repository URL, `update --template-url` fills it in later
+        templateUrl = None
+        if exactPath is None and templateSource in ("github", "github-reference"):
+            reference = CraftLetCache.readGithubTemplateReference(
+                path=CraftLetCache.getCacheBasePath(), templateName=templateName
             )
+            if reference is not None:
+                import asyncio
+
+                # An explicit --ref wins over the ref the reference was saved with
+                templateUrl, ref = reference.coreData, ref or reference.payload["ref"]
+                typer.echo(f"Downloading referenced template {templateUrl}@{ref}")
+                exactPath = asyncio.run(
+                    CraftLetCache.promoteGithubTemplateReference(
+                        path=CraftLetCache.getCacheBasePath(), templateName=templateName, ref=ref
+                    )
+                )
+        ref = ref or "main"
+        if exactPath is None:
+            raise CraftLetException(errorMessage=f"Template {templateName}@{ref} is not cached")
+        commitSha = exactPath.name if GitFunction.isCommitSha(ref=exactPath.name) else None
         CraftLet.loadTemplateLocal(
             templatePath=exactPath,
             targetDestination=Path.cwd() / projectName,
             generateEnv=generateEnv,
+            manifest=ProjectManifest(templateUrl=templateUrl, ref=ref, commitSha=commitSha),
+            durable=durable,
         )
     else:
-        pass  # TODO (Implement the Profile Specific Cache)
+        from craftlet.features.ProfileCache import ProfileCache
+
+        exactPath, profileTemplate = ProfileCache.resolveProfileTemplate(profileName=localProfile, alias=templateAlias)
+        projectName = typer.prompt(text="Enter The Project Name: ")
+        CraftLet.loadTemplateLocal(
+            templatePath=exactPath,
+            targetDestination=Path.cwd() / projectName,
+            generateEnv=generateEnv,
+            manifest=ProjectManifest(
+                templateUrl=profileTemplate.url, ref=profileTemplate.ref, commitSha=profileTemplate.commitSha
+            ),
+            durable=durable,
+        )
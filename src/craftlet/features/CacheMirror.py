@@ -0,0 +1,185 @@
+import asyncio
+from contextlib import suppress
+from email.utils import formatdate
+from pathlib import Path
+from typing import ClassVar, Dict, Tuple
+from urllib.parse import unquote, urlsplit
+
+import typer
+
+from craftlet.utils.profiler import Profiler
+
+GITHUB_TEMPLATE_PREFIX = "offline/template/github"
+HIDDEN_SUFFIXES = (".part", ".tmp")
+STATUS_REASONS = {
+    200: "OK",
+    206: "Partial Content",
+    304: "Not Modified",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    416: "Range Not Satisfiable",
+}
+
+
+class CacheMirrorServer:
+    def __init__(self, cacheRoot: Path, host: str, port: int):
+        self.cacheRoot = cacheRoot.resolve()
+        self.host = host
+        self.port = port
+
+    async def serve(self):
+        server = await asyncio.start_server(self.handleClient, host=self.host, port=self.port)
+        typer.echo(f"📡 Serving {self.cacheRoot} on http://{self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+    async def handleClient(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine:
+                    break
+                method, target, version = requestLine.decode("latin-1").split()
+                headers: Dict[str, str] = {}
+                while (headerLine := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    headerName, _, headerValue = headerLine.decode("latin-1").partition(":")
+                    headers[headerName.strip().lower()] = headerValue.strip()
+                await self.respond(method=method, target=target, headers=headers, writer=writer)
+                if version != "HTTP/1.1" or headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    def resolveFile(self, target: str):
+        relativePath = unquote(urlsplit(target).path).lstrip("/")
+        filePath = (self.cacheRoot / relativePath).resolve()
+        if not filePath.is_relative_to(self.cacheRoot) or not filePath.is_file():
+            return None
+        # Entries still being written by cache-template are not served
+        if filePath.name.endswith(HIDDEN_SUFFIXES):
+            return None
+        return filePath
+
+    @staticmethod
+    def parseRange(rangeHeader: str, size: int) -> Tuple[int, int] | None:
+        unit, _, byteRange = rangeHeader.partition("=")
+        if unit.strip() != "bytes" or "," in byteRange:
+            raise ValueError(rangeHeader)
+        startText, _, endText = byteRange.strip().partition("-")
+        if startText:
+            start = int(startText)
+            end = min(int(endText), size - 1) if endText else size - 1
+        else:
+            start = max(size - int(endText), 0)
+            end = size - 1
+        if start > end or start >= size:
+            return None
+        return start, end
+
+    async def writeHead(self, writer: asyncio.StreamWriter, status: int, headers: Dict[str, str]):
+        lines = [f"HTTP/1.1 {status} {STATUS_REASONS[status]}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write((("\r\n").join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    async def respond(self, method: str, target: str, headers: Dict[str, str], writer: asyncio.StreamWriter):
+        if method not in ("GET", "HEAD"):
+            await self.writeHead(writer, 405, {"Allow": "GET, HEAD", "Content-Length": "0"})
+            return
+        filePath = self.resolveFile(target=target)
+        if filePath is None:
+            await self.writeHead(writer, 404, {"Content-Length": "0"})
+            return
+
+        fileStat = filePath.stat()
+        size = fileStat.st_size
+        etag = f'"{size:x}-{fileStat.st_mtime_ns:x}"'
+        responseHeaders = {
+            "ETag": etag,
+            "Last-Modified": formatdate(fileStat.st_mtime, usegmt=True),
+            "Accept-Ranges": "bytes",
+            "Content-Type": "application/octet-stream",
+        }
+        if etag in (tag.strip() for tag in headers.get("if-none-match", "").split(",")):
+            await self.writeHead(writer, 304, responseHeaders)
+            return
+
+        status, start, end = 200, 0, size - 1
+        rangeHeader = headers.get("range")
+        if rangeHeader and headers.get("if-range", etag) == etag:
+            try:
+                byteRange = CacheMirrorServer.parseRange(rangeHeader=rangeHeader, size=size)
+            except ValueError:
+                # A Range header that cannot be parsed is ignored and the whole file is sent (RFC 9110)
+                pass
+            else:
+                if byteRange is None:
+                    responseHeaders["Content-Range"] = f"bytes */{size}"
+                    responseHeaders["Content-Length"] = "0"
+                    await self.writeHead(writer, 416, responseHeaders)
+                    return
+                status, (start, end) = 206, byteRange
+                responseHeaders["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+        contentLength = max(end - start + 1, 0)
+        responseHeaders["Content-Length"] = str(contentLength)
+        await self.writeHead(writer, status, responseHeaders)
+        if method == "HEAD" or contentLength == 0:
+            return
+        with open(filePath, "rb") as fileObj:
+            await asyncio.get_running_loop().sendfile(writer.transport, fileObj, start, contentLength)
+
+
+class CacheMirrorClient:
+    mirrorUrl: ClassVar[str | None] = None
+    timeout: ClassVar[float] = 5.0
+
+    @staticmethod
+    def isConfigured():
+        return bool(CacheMirrorClient.mirrorUrl)
+
+    @staticmethod
+    async def fetch(relativePath: str):
+        import httpx
+
+        url = f"{CacheMirrorClient.mirrorUrl.rstrip('/')}/{relativePath}"
+        try:
+            async with httpx.AsyncClient(timeout=CacheMirrorClient.timeout) as client:
+                response = await client.get(url)
+        except httpx.HTTPError:
+            return None
+        if response.status_code != 200:
+            return None
+        return response.content
+
+    @staticmethod
+    async def resolveRef(templateName: str, ref: str):
+        import cbor2
+
+        if not CacheMirrorClient.isConfigured():
+            return None
+        with Profiler.phase("mirror resolve ref", ref=ref):
+            refIndexBytes = await CacheMirrorClient.fetch(f"{GITHUB_TEMPLATE_PREFIX}/{templateName}/refs.cbor")
+        if refIndexBytes is None:
+            return None
+        return cbor2.loads(refIndexBytes).get(ref)
+
+    @staticmethod
+    def getTemplateArchiveUrl(templateName: str, commitSha: str):
+        return f"{CacheMirrorClient.mirrorUrl.rstrip('/')}/{GITHUB_TEMPLATE_PREFIX}/{templateName}/{commitSha}/template.tar.gz"
+
+    @staticmethod
+    async def fetchTemplateArchive(templateName: str, commitSha: str):
+        if not CacheMirrorClient.isConfigured():
+            return None
+        with Profiler.phase("mirror download", template=templateName):
+            archiveBytes = await CacheMirrorClient.fetch(
+                f"{GITHUB_TEMPLATE_PREFIX}/{templateName}/{commitSha}/template.tar.gz"
+            )
+        if archiveBytes is not None:
+            Profiler.addBytes("downloaded", len(archiveBytes))
+        return archiveBytes
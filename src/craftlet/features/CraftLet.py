@@ -5,82 +5,166 @@ from pathlib import Path
 from typing import Dict, List
 from zipfile import ZIP_DEFLATED, ZipFile
 
-import httpx
-
+from craftlet.features.CacheMirror import CacheMirrorClient
+from craftlet.features.StagedProjectWriter import StagedProjectWriter
 from craftlet.features.TemplatePluginConfiguration import configureTemplatePlugin
+from craftlet.models.ProjectManifest import MANIFEST_DIR, MANIFEST_FILE, ProjectManifest
 from craftlet.utils.exceptions import CraftLetException
-from craftlet.utils.helperFunctions import CLIFunctions
-from craftlet.utils.mappers import repoUrlToZipUrl
+from craftlet.utils.helperFunctions import CLIFunctions, GitFunction
+from craftlet.utils.mappers import repoUrlToCommitUrl, repoUrlToOwnerAndName, repoUrlToZipUrl
+from craftlet.utils.profiler import Profiler
 
 
 class CraftLet:
     @staticmethod
-    async def getTemplateBytesGithub(repoUrl: str):
-        zipUrl = repoUrlToZipUrl(repoUrl=repoUrl)
+    async def resolveGithubRef(repoUrl: str, ref: str = "main"):
+        if GitFunction.isCommitSha(ref=ref):
+            return ref.lower()
+        import httpx
+
+        commitUrl = repoUrlToCommitUrl(repoUrl=repoUrl, ref=ref)
+
+        try:
+            with Profiler.phase("resolve ref", ref=ref):
+                async with httpx.AsyncClient() as client:
+                    response = await client.get(commitUrl, headers={"Accept": "application/vnd.github.sha"})
+                    response.raise_for_status()
+                    commitSha = response.text.strip().lower()
+        except httpx.TransportError:
+            # Branches and tags move, so the mirror's ref index is only trusted when GitHub is unreachable
+            _, templateName = repoUrlToOwnerAndName(repoUrl=repoUrl)
+            commitSha = await CacheMirrorClient.resolveRef(templateName=templateName, ref=ref)
+            if commitSha is None:
+                raise
+        if not GitFunction.isCommitSha(ref=commitSha):
+            raise CraftLetException(errorMessage=f"Could not resolve ref({ref}) to a commit")
+        return commitSha
+
+    @staticmethod
+    async def getTemplateBytesGithub(repoUrl: str, ref: str = "main", useMirror: bool = True):
+        if useMirror and GitFunction.isCommitSha(ref=ref):
+            _, templateName = repoUrlToOwnerAndName(repoUrl=repoUrl)
+            archiveBytes = await CacheMirrorClient.fetchTemplateArchive(templateName=templateName, commitSha=ref)
+            if archiveBytes is not None:
+                with tarfile.open(fileobj=BytesIO(archiveBytes), mode="r:gz") as tarObj:
+                    return CraftLet.tarToZipBytes(tarObj=tarObj)
+        import httpx
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(zipUrl)
-            response.raise_for_status()
-            zipBytes = response.content
+        zipUrl = repoUrlToZipUrl(repoUrl=repoUrl, ref=ref)
+
+        with Profiler.phase("download", url=zipUrl):
+            async with httpx.AsyncClient() as client:
+                response = await client.get(zipUrl)
+                response.raise_for_status()
+                zipBytes = response.content
+        Profiler.addBytes("downloaded", len(zipBytes))
         return zipBytes
 
     @staticmethod
-    async def loadTemplateGithub(repoUrl: str, targetDir: Path, generateEnv: bool):
-        zipBytes = await CraftLet.getTemplateBytesGithub(repoUrl=repoUrl)
+    async def loadTemplateGithub(
+        repoUrl: str,
+        targetDir: Path,
+        generateEnv: bool,
+        ref: str = "main",
+        pipelined: bool = False,
+        manifest: ProjectManifest | None = None,
+        durable: bool = False,
+    ):
+        if pipelined:
+            from craftlet.features.PipelinedTemplateLoader import PipelinedTemplateLoader
+
+            await PipelinedTemplateLoader(
+                repoUrl=repoUrl, ref=ref, targetDir=targetDir, generateEnv=generateEnv, manifest=manifest, durable=durable
+            ).run()
+            return
+        zipBytes = await CraftLet.getTemplateBytesGithub(repoUrl=repoUrl, ref=ref)
 
-        CraftLet.diskWrite(inputBytes=zipBytes, targetDestination=targetDir, generateEnv=generateEnv)
+        CraftLet.diskWrite(
+            inputBytes=zipBytes, targetDestination=targetDir, generateEnv=generateEnv, manifest=manifest, durable=durable
+        )
 
     @staticmethod
-    def loadTemplateLocal(templatePath: Path, targetDestination: Path, generateEnv: bool):
+    def loadTemplateLocal(
+        templatePath: Path,
+        targetDestination: Path,
+        generateEnv: bool,
+        manifest: ProjectManifest | None = None,
+        durable: bool = False,
+    ):
         tarFilePath = templatePath / "template.tar.gz"
         if tarFilePath.is_file() and tuple(tarFilePath.suffixes) == (".tar", ".gz"):
-            zipBuffer = BytesIO()
-            with (
-                tarfile.open(tarFilePath, "r:gz") as tarObj,
-                ZipFile(zipBuffer, "w", compression=ZIP_DEFLATED) as zipObj,
-            ):
-                for member in tarObj.getmembers():
-                    if member.isfile():
-                        extractedFile = tarObj.extractfile(member)
-                        if extractedFile is not None:
-                            tempStore = BytesIO()
-                            while chunk := extractedFile.read(1024 * 1024):
-                                tempStore.write(chunk)
-                            zipObj.writestr(member.name, tempStore.getvalue())
+            Profiler.addBytes("cache read", tarFilePath.stat().st_size)
+            with tarfile.open(tarFilePath, "r:gz") as tarObj:
+                zipBytes = CraftLet.tarToZipBytes(tarObj=tarObj)
             CraftLet.diskWrite(
-                inputBytes=zipBuffer.getvalue(),
+                inputBytes=zipBytes,
                 targetDestination=targetDestination,
                 generateEnv=generateEnv,
+                manifest=manifest,
+                durable=durable,
             )
         else:
             raise CraftLetException(errorMessage="Template File doesn't exist")
 
     @staticmethod
-    def diskWrite(inputBytes: bytes, targetDestination: Path, generateEnv: bool):
+    def tarToZipBytes(tarObj: tarfile.TarFile):
+        zipBuffer = BytesIO()
+        with (
+            Profiler.phase("tar conversion"),
+            ZipFile(zipBuffer, "w", compression=ZIP_DEFLATED) as zipObj,
+        ):
+            for member in tarObj.getmembers():
+                if member.isfile():
+                    extractedFile = tarObj.extractfile(member)
+                    if extractedFile is not None:
+                        tempStore = BytesIO()
+                        while chunk := extractedFile.read(1024 * 1024):
+                            tempStore.write(chunk)
+                        zipObj.writestr(member.name, tempStore.getvalue())
+        return zipBuffer.getvalue()
+
+    @staticmethod
+    def diskWrite(
+        inputBytes: bytes,
+        targetDestination: Path,
+        generateEnv: bool,
+        manifest: ProjectManifest | None = None,
+        durable: bool = False,
+    ):
         with ZipFile(BytesIO(inputBytes)) as z:
             root = z.namelist()[0].split("/")[0]
-            templateConfig = CraftLet.loadTemplateConfigFile(zipFileInstance=z, root=root)
-            personalTemplateConfig, environmentVariables = CLIFunctions.buildConfigFromDict(
-                dictFile=templateConfig
-            )
-            unSelectedPluginPaths = configureTemplatePlugin(pluginDict=templateConfig.get("ProjectPlugin",{}))
-
-            for name in z.namelist():
-                if name.endswith("/") or name.endswith("templateConfig.json"):
-                    continue
-                relativePath = Path(name).relative_to(root)
-                if relativePath in unSelectedPluginPaths:
-                    continue
-                dest = targetDestination / relativePath
-                dest.parent.mkdir(parents=True, exist_ok=True)
-
-                rawText = z.read(name).decode()
-                dest.write_text(rawText)
-            if generateEnv:
-                CraftLet.configureEnvironmentVariables(
-                    environmentVariables=environmentVariables,
-                    targetDir=targetDestination,
+            with Profiler.phase("config parse"):
+                templateConfig = CraftLet.loadTemplateConfigFile(zipFileInstance=z, root=root)
+            with Profiler.phase("config prompts"):
+                personalTemplateConfig, environmentVariables = CLIFunctions.buildConfigFromDict(
+                    dictFile=templateConfig
                 )
+            with Profiler.phase("plugin selection"):
+                unSelectedPluginPaths = configureTemplatePlugin(pluginDict=templateConfig.get("ProjectPlugin",{}))
+
+            # Members land in a staging directory that is renamed into place once complete
+            with StagedProjectWriter(targetDir=targetDestination, durable=durable) as writer:
+                for name in z.namelist():
+                    if name.endswith("/") or name.endswith("templateConfig.json"):
+                        continue
+                    # Excluded members are never read, so a disabled plugin directory costs one trie walk per entry
+                    relativeParts = name.split("/")[1:]
+                    if unSelectedPluginPaths and unSelectedPluginPaths.isExcluded(relativeParts):
+                        continue
+                    with Profiler.phase("file write", path=name):
+                        # Written as bytes so the digests recorded for `update` match the files on disk
+                        memberBytes = z.read(name)
+                        writer.writeFile(relativeParts=relativeParts, data=memberBytes)
+                    if manifest is not None:
+                        manifest.recordFile(relativePath=("/").join(relativeParts), data=memberBytes)
+                if manifest is not None:
+                    manifest.excludedPaths = unSelectedPluginPaths.paths
+                    writer.writeFile(relativeParts=[MANIFEST_DIR, MANIFEST_FILE], data=manifest.dumps())
+                if generateEnv:
+                    CraftLet.configureEnvironmentVariables(
+                        environmentVariables=environmentVariables,
+                        writer=writer,
+                    )
 
     @staticmethod
     def loadTemplateConfigFile(zipFileInstance: ZipFile, root: str):
@@ -91,9 +175,8 @@ class CraftLet:
             return {}
 
     @staticmethod
-    def configureEnvironmentVariables(environmentVariables: Dict[str, str], targetDir: Path):
-        envPath = targetDir / ".env"
+    def configureEnvironmentVariables(environmentVariables: Dict[str, str], writer: StagedProjectWriter):
         lines: List[str] = []
         for key, value in environmentVariables.items():
             lines.append(f"{key}={value}")
-        envPath.write_text(("\n").join(lines))
+        writer.writeText(relativeParts=[".env"], text=("\n").join(lines))
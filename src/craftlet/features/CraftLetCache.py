@@ -1,18 +1,16 @@
-import hashlib
 import sys
-import tarfile
 from io import BytesIO
 from pathlib import Path
-from tarfile import TarInfo
-from zipfile import ZipFile
 
-import cbor2
 import typer
 
 from craftlet.models.Cacheable import Cacheable, GithubTemplate, GithubTemplateReference
 from craftlet.utils.exceptions import CraftLetException
-from craftlet.utils.hashUtils import HashWriter
-from craftlet.utils.mappers import cborGithubTemplateReferenceEncoder
+from craftlet.utils.helperFunctions import CacheFunction, GitFunction
+from craftlet.utils.mappers import cborGithubTemplateReferenceEncoder, repoUrlToOwnerAndName
+from craftlet.utils.profiler import Profiler
+
+PREFETCH_CONCURRENCY = 4
 
 
 class CraftLetCache:
@@ -25,6 +23,12 @@ class CraftLetCache:
             return True
         return False
 
+    @staticmethod
+    def getCacheBasePath():
+        if CraftLetCache.isRunningInEnvironment():
+            return Path(sys.prefix)
+        return CacheFunction.getOSCacheDir()
+
     @staticmethod
     def showCache(cacheDir: Path):
         if cacheDir.exists():
@@ -52,41 +56,191 @@ class CraftLetCache:
                     f"An unidentified cacheable data(type: {type(data).__name__}) is requested."
                 )
 
+    @staticmethod
+    def getGithubReferenceDir(path: Path):
+        return path / "craftlet" / ".cache" / "offline" / "template" / "github-reference"
+
     @staticmethod
     def cacheGithubTemplateRefrence(data: Cacheable, path: Path):
-        exactPath = (
-            path
-            / "craftlet"
-            / ".cache"
-            / "offline"
-            / "template"
-            / "github-reference"
-            / data.name
-        )
+        import cbor2
+
+        referenceDir = CraftLetCache.getGithubReferenceDir(path=path)
+        referenceDir.mkdir(parents=True, exist_ok=True)
         cborBinary = cbor2.dumps(obj=data, default=cborGithubTemplateReferenceEncoder)
 
-        with open(exactPath, "wb") as f:
-            for byte in cborBinary:
-                f.write(bytes([byte]))
+        partialPath = referenceDir / f"{data.name}.part"
+        partialPath.write_bytes(cborBinary)
+        partialPath.replace(referenceDir / data.name)
 
     @staticmethod
-    def cacheGithubTemplate(data: Cacheable, path: Path):
-        zipBuffer = BytesIO(data.coreData)
-        exactPath = (
-            path / "craftlet" / ".cache" / "offline" / "template" / "github" / data.name
+    def readGithubTemplateReference(path: Path, templateName: str):
+        import cbor2
+
+        referencePath = CraftLetCache.getGithubReferenceDir(path=path) / templateName
+        if not referencePath.is_file():
+            return None
+        rawReference = cbor2.loads(referencePath.read_bytes())
+        # Entries written before refs were recorded only hold the URL
+        return GithubTemplateReference(
+            name=templateName, coreData=rawReference[0], payload={"ref": rawReference.get(1, "main")}
         )
+
+    @staticmethod
+    def listGithubTemplateReferences(path: Path):
+        referenceDir = CraftLetCache.getGithubReferenceDir(path=path)
+        if not referenceDir.is_dir():
+            return []
+        return sorted(entry.name for entry in referenceDir.iterdir() if entry.is_file() and entry.suffix != ".part")
+
+    @staticmethod
+    async def fetchGithubTemplateForCache(templateUrl: str, templateName: str, ref: str):
+        from craftlet.features.CacheMirror import CacheMirrorClient
+        from craftlet.features.CraftLet import CraftLet
+
+        basePath = CraftLetCache.getCacheBasePath()
+        commitSha = await CraftLet.resolveGithubRef(repoUrl=templateUrl, ref=ref)
+        if CraftLetCache.getCachedGithubTemplate(path=basePath, templateName=templateName, commitSha=commitSha):
+            templateDir = CraftLetCache.getGithubTemplateDir(path=basePath, templateName=templateName)
+            CraftLetCache.recordGithubRef(templateDir=templateDir, ref=ref, commitSha=commitSha)
+            return commitSha, None, "is already cached"
+        archiveBytes = await CacheMirrorClient.fetchTemplateArchive(templateName=templateName, commitSha=commitSha)
+        if archiveBytes is not None:
+            CraftLetCache.cacheGithubTemplateArchive(
+                path=basePath, templateName=templateName, commitSha=commitSha, ref=ref, archiveBytes=archiveBytes
+            )
+            return commitSha, None, "was cached from the mirror"
+        templateBytes = await CraftLet.getTemplateBytesGithub(repoUrl=templateUrl, ref=commitSha, useMirror=False)
+        return commitSha, templateBytes, None
+
+    @staticmethod
+    async def promoteGithubTemplateReference(path: Path, templateName: str, ref: str | None = None):
+        import asyncio
+
+        reference = CraftLetCache.readGithubTemplateReference(path=path, templateName=templateName)
+        if reference is None:
+            return None
+        isRecordedRef = ref is None or ref == reference.payload["ref"]
+        ref = ref or reference.payload["ref"]
+        with Profiler.phase("promote reference", template=templateName):
+            commitSha, templateBytes, _ = await CraftLetCache.fetchGithubTemplateForCache(
+                templateUrl=reference.coreData, templateName=templateName, ref=ref
+            )
+            if templateBytes is not None:
+                ownerName, _ = repoUrlToOwnerAndName(repoUrl=reference.coreData)
+                cacheableData = GithubTemplate(
+                    name=templateName,
+                    coreData=templateBytes,
+                    dataVersion=1,
+                    payload={
+                        "ownerName": ownerName,
+                        "template_url": reference.coreData,
+                        "ref": ref,
+                        "commitSha": commitSha,
+                    },
+                )
+                # The tar.gz conversion is CPU bound, so it runs off the loop to let other promotions proceed
+                await asyncio.to_thread(CraftLetCache.cacheGithubTemplate, cacheableData, path)
+        # The full template now answers for the recorded ref, so the reference entry is retired
+        if isRecordedRef:
+            (CraftLetCache.getGithubReferenceDir(path=path) / templateName).unlink(missing_ok=True)
+        return CraftLetCache.getCachedGithubTemplate(path=path, templateName=templateName, commitSha=commitSha)
+
+    @staticmethod
+    async def prefetchGithubTemplateReferences(path: Path, concurrency: int = PREFETCH_CONCURRENCY):
+        import asyncio
+
+        semaphore = asyncio.Semaphore(concurrency)
+        templateNames = CraftLetCache.listGithubTemplateReferences(path=path)
+
+        async def promote(templateName: str):
+            async with semaphore:
+                return await CraftLetCache.promoteGithubTemplateReference(path=path, templateName=templateName)
+
+        results = await asyncio.gather(*(promote(templateName) for templateName in templateNames), return_exceptions=True)
+        return dict(zip(templateNames, results))
+
+    @staticmethod
+    def getGithubTemplateDir(path: Path, templateName: str):
+        return path / "craftlet" / ".cache" / "offline" / "template" / "github" / templateName
+
+    @staticmethod
+    def readGithubRefIndex(templateDir: Path):
+        import cbor2
+
+        refIndexPath = templateDir / "refs.cbor"
+        if not refIndexPath.is_file():
+            return {}
+        return cbor2.loads(refIndexPath.read_bytes())
+
+    @staticmethod
+    def recordGithubRef(templateDir: Path, ref: str, commitSha: str):
+        import cbor2
+
+        refIndex = CraftLetCache.readGithubRefIndex(templateDir=templateDir)
+        if refIndex.get(ref) == commitSha:
+            return
+        refIndex[ref] = commitSha
+        templateDir.mkdir(parents=True, exist_ok=True)
+        tempPath = templateDir / "refs.cbor.tmp"
+        tempPath.write_bytes(cbor2.dumps(refIndex))
+        tempPath.replace(templateDir / "refs.cbor")
+
+    @staticmethod
+    def getCachedGithubTemplate(path: Path, templateName: str, commitSha: str):
+        exactPath = CraftLetCache.getGithubTemplateDir(path=path, templateName=templateName) / commitSha
+        if (exactPath / "template.tar.gz").is_file():
+            return exactPath
+        return None
+
+    @staticmethod
+    def resolveCachedTemplateRef(templateDir: Path, ref: str | None):
+        requestedRef = ref or "main"
+        if GitFunction.isCommitSha(ref=requestedRef):
+            commitSha = requestedRef.lower()
+        else:
+            commitSha = CraftLetCache.readGithubRefIndex(templateDir=templateDir).get(requestedRef)
+        if commitSha is not None and (templateDir / commitSha / "template.tar.gz").is_file():
+            return templateDir / commitSha
+        # Entries cached before commit keyed layout live directly under the template directory. Their
+        # version is unknown, so they only answer when no ref was asked for and nothing recorded a ref
+        if ref is None and not (templateDir / "refs.cbor").is_file() and (templateDir / "template.tar.gz").is_file():
+            return templateDir
+        return None
+
+    @staticmethod
+    def writeTemplateArchive(exactPath: Path, archiveBytes: bytes):
+        from craftlet.utils.hashUtils import timedSha256
+
+        exactPath.mkdir(parents=True, exist_ok=True)
+        partialTarFilePath = exactPath / "template.tar.gz.part"
+        partialTarFilePath.write_bytes(archiveBytes)
+        (exactPath / "template.sha256").write_text(timedSha256(archiveBytes).hexdigest() + "\n")
+        Profiler.addBytes("cache written", len(archiveBytes))
+        partialTarFilePath.replace(exactPath / "template.tar.gz")
+
+    @staticmethod
+    def writeZipAsTemplateArchive(exactPath: Path, zipBytes: bytes, templateName: str, sha256Hash: str | None = None):
+        import hashlib
+        import tarfile
+        from tarfile import TarInfo
+        from zipfile import ZipFile
+
+        from craftlet.utils.hashUtils import HashWriter
+
+        zipBuffer = BytesIO(zipBytes)
         tarFilePath = exactPath / "template.tar.gz"
         tarFilePath.parent.mkdir(parents=True, exist_ok=True)
         hashFilePath = exactPath / "template.sha256"
         isHashAvailable = True
 
-        if data.payload and data.payload.get("sha256Hash", None):
-            hashFilePath.write_text(data.payload.get("sha256Hash", "") + "\n")
+        if sha256Hash:
+            hashFilePath.write_text(sha256Hash + "\n")
         else:
-            typer.echo(f"sha256 hashcode for the template {data.name} is missing. Will be created in process")
+            typer.echo(f"sha256 hashcode for the template {templateName} is missing. Will be created in process")
             isHashAvailable = False
         hashObj = hashlib.sha256()
-        with open(tarFilePath, "wb") as fileOut:
+        partialTarFilePath = exactPath / "template.tar.gz.part"
+        with Profiler.phase("tar conversion", template=templateName), open(partialTarFilePath, "wb") as fileOut:
             if not isHashAvailable:
                 fileOut = HashWriter(rawWriter=fileOut, hashWriter=hashObj)
             with ZipFile(zipBuffer) as zipFile:
@@ -106,9 +260,34 @@ class CraftLetCache:
 
                         with zipFile.open(zipInfo) as streamSource:
                             tarFile.addfile(tarInfo, fileobj=streamSource)
+        Profiler.addBytes("cache written", partialTarFilePath.stat().st_size)
+        partialTarFilePath.replace(tarFilePath)
         if not isHashAvailable:
             finalHash = hashObj.hexdigest()
             hashFilePath.write_text(finalHash + "\n")
+
+    @staticmethod
+    def cacheGithubTemplateArchive(path: Path, templateName: str, commitSha: str, ref: str, archiveBytes: bytes):
+        templateDir = CraftLetCache.getGithubTemplateDir(path=path, templateName=templateName)
+        CraftLetCache.writeTemplateArchive(exactPath=templateDir / commitSha, archiveBytes=archiveBytes)
+        CraftLetCache.recordGithubRef(templateDir=templateDir, ref=ref, commitSha=commitSha)
+
+    @staticmethod
+    def cacheGithubTemplate(data: Cacheable, path: Path):
+        templateDir = CraftLetCache.getGithubTemplateDir(path=path, templateName=data.name)
+        commitSha = data.payload.get("commitSha") if data.payload else None
+        exactPath = templateDir if commitSha is None else templateDir / commitSha
+        if commitSha is None or not (exactPath / "template.tar.gz").is_file():
+            CraftLetCache.writeZipAsTemplateArchive(
+                exactPath=exactPath,
+                zipBytes=data.coreData,
+                templateName=data.name,
+                sha256Hash=data.payload.get("sha256Hash") if data.payload else None,
+            )
+        if commitSha is not None:
+            CraftLetCache.recordGithubRef(
+                templateDir=templateDir, ref=data.payload.get("ref", commitSha), commitSha=commitSha
+            )
     # ============================================================================
     # ONLINE CACHE METHODS
     # ============================================================================
@@ -0,0 +1,150 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from craftlet.features.ModuleDependencyGraph import ModuleDependencyGraph
+from craftlet.utils.exceptions import CraftLetException
+from craftlet.utils.profiler import Profiler
+
+SNAPSHOT_VERSION = 1
+
+Edge = Tuple[str, str]
+
+
+@dataclass
+class GraphSnapshotDiff:
+    addedEdges: List[Edge] = field(default_factory=list)
+    removedEdges: List[Edge] = field(default_factory=list)
+    newCycles: List[List[str]] = field(default_factory=list)
+
+
+class DependencyGraphSnapshot:
+    @staticmethod
+    def toModuleName(modulePath: Path, importRoots: List[Path]):
+        for importRoot in importRoots:
+            if modulePath.is_relative_to(importRoot):
+                parts = list(modulePath.relative_to(importRoot).with_suffix("").parts)
+                if parts and parts[-1] == "__init__":
+                    parts.pop()
+                return (".").join(parts)
+        return modulePath.as_posix()
+
+    @staticmethod
+    def graphToEdges(graph: Dict[str, Set[str]], projectRootPath: Path) -> Set[Edge]:
+        # The graph maps an imported module to the files importing it. Importers are turned into
+        # module names relative to their import root, so both ends of an edge use the same naming
+        # and snapshots taken in different checkouts compare equal.
+        projectRootPath = projectRootPath.resolve()
+        importRoots = sorted(
+            [*ModuleDependencyGraph.extractImportRoots(rootPath=projectRootPath), projectRootPath],
+            key=lambda path: len(path.parts),
+            reverse=True,
+        )
+        return {
+            (DependencyGraphSnapshot.toModuleName(modulePath=Path(importer).resolve(), importRoots=importRoots), imported)
+            for imported, importers in graph.items()
+            for importer in importers
+        }
+
+    @staticmethod
+    def dumps(edges: Iterable[Edge]):
+        import cbor2
+
+        # Module names are stored once in a table and edges as a flat list of index pairs
+        sortedEdges = sorted(edges)
+        nodes = sorted({node for edge in sortedEdges for node in edge})
+        nodeIndex = {node: index for index, node in enumerate(nodes)}
+        flatEdges = [nodeIndex[node] for edge in sortedEdges for node in edge]
+        return cbor2.dumps({"version": SNAPSHOT_VERSION, "nodes": nodes, "edges": flatEdges})
+
+    @staticmethod
+    def loads(snapshotBytes: bytes) -> Set[Edge]:
+        import cbor2
+
+        snapshot = cbor2.loads(snapshotBytes)
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+            raise CraftLetException(errorMessage="Unsupported dependency graph snapshot version")
+        nodes: List[str] = snapshot["nodes"]
+        flatEdges: List[int] = snapshot["edges"]
+        return {(nodes[flatEdges[index]], nodes[flatEdges[index + 1]]) for index in range(0, len(flatEdges), 2)}
+
+    @staticmethod
+    def save(snapshotPath: Path, edges: Iterable[Edge]):
+        tempPath = snapshotPath.with_name(snapshotPath.name + ".tmp")
+        tempPath.write_bytes(DependencyGraphSnapshot.dumps(edges=edges))
+        tempPath.replace(snapshotPath)
+
+    @staticmethod
+    def load(snapshotPath: Path):
+        if not snapshotPath.is_file():
+            raise CraftLetException(errorMessage=f"Dependency graph snapshot {snapshotPath} doesn't exist")
+        with Profiler.phase("snapshot load", path=str(snapshotPath)):
+            return DependencyGraphSnapshot.loads(snapshotBytes=snapshotPath.read_bytes())
+
+    @staticmethod
+    def capture(projectRootPath: Path):
+        projectRootPath = projectRootPath.resolve()
+        graph = ModuleDependencyGraph.buildModuleDependencyGraph(projectRootPath=projectRootPath)
+        return DependencyGraphSnapshot.graphToEdges(graph=graph, projectRootPath=projectRootPath)
+
+    @staticmethod
+    def findCycles(edges: Iterable[Edge]) -> Set[FrozenSet[str]]:
+        # Iterative Tarjan: every strongly connected component with more than one module,
+        # or a module importing itself, is a cycle
+        adjacency: Dict[str, List[str]] = {}
+        selfLoops = set()
+        for importer, imported in edges:
+            adjacency.setdefault(importer, []).append(imported)
+            adjacency.setdefault(imported, [])
+            if importer == imported:
+                selfLoops.add(importer)
+
+        indexOf: Dict[str, int] = {}
+        lowLink: Dict[str, int] = {}
+        stack: List[str] = []
+        onStack = set()
+        cycles: Set[FrozenSet[str]] = set()
+        for startNode in adjacency:
+            if startNode in indexOf:
+                continue
+            workStack = [(startNode, 0)]
+            while workStack:
+                node, childPosition = workStack.pop()
+                if childPosition == 0:
+                    indexOf[node] = lowLink[node] = len(indexOf)
+                    stack.append(node)
+                    onStack.add(node)
+                children = adjacency[node]
+                if childPosition < len(children):
+                    workStack.append((node, childPosition + 1))
+                    child = children[childPosition]
+                    if child not in indexOf:
+                        workStack.append((child, 0))
+                    elif child in onStack:
+                        lowLink[node] = min(lowLink[node], indexOf[child])
+                    continue
+                if workStack:
+                    parent = workStack[-1][0]
+                    lowLink[parent] = min(lowLink[parent], lowLink[node])
+                if lowLink[node] == indexOf[node]:
+                    component = set()
+                    while True:
+                        member = stack.pop()
+                        onStack.discard(member)
+                        component.add(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or node in selfLoops:
+                        cycles.add(frozenset(component))
+        return cycles
+
+    @staticmethod
+    def diff(baselineEdges: Set[Edge], currentEdges: Set[Edge]):
+        with Profiler.phase("snapshot diff"):
+            baselineCycles = DependencyGraphSnapshot.findCycles(edges=baselineEdges)
+            currentCycles = DependencyGraphSnapshot.findCycles(edges=currentEdges)
+            return GraphSnapshotDiff(
+                addedEdges=sorted(currentEdges - baselineEdges),
+                removedEdges=sorted(baselineEdges - currentEdges),
+                newCycles=sorted(sorted(cycle) for cycle in currentCycles - baselineCycles),
+            )
@@ -9,6 +9,7 @@ from craftlet.features.DirectoryTree import DirectoryTree
 from craftlet.models.DirectoryTreeNode import DirectoryTreeNode
 from craftlet.models.ImportItem import ImportItem
 from craftlet.utils.enums import ModuleType
+from craftlet.utils.profiler import Profiler
 
 
 class ModuleDependencyGraph:
@@ -176,7 +177,8 @@ class ModuleDependencyGraph:
     @staticmethod
     def buildModuleDependencyGraph(projectRootPath: Path):
         graph = defaultdict(set)
-        directoryTree = DirectoryTree.buildDirectoryTree(root=projectRootPath)
+        with Profiler.phase("dependency graph: directory tree"):
+            directoryTree = DirectoryTree.buildDirectoryTree(root=projectRootPath)
 
         currNode = directoryTree
         currNodePath = projectRootPath
@@ -186,9 +188,10 @@ class ModuleDependencyGraph:
             currNode, currNodePath = queue.pop()
 
             if currNode.children is None:
-                currModuleImportList = ModuleDependencyGraph.extractImports(
-                    filePath=currNodePath, rootPath=projectRootPath
-                )
+                with Profiler.phase("dependency graph: extract imports", module=str(currNodePath)):
+                    currModuleImportList = ModuleDependencyGraph.extractImports(
+                        filePath=currNodePath, rootPath=projectRootPath
+                    )
                 for importItem in currModuleImportList:
                     if importItem.type == ModuleType.LOCAL_MODULE:
                         graph[importItem.fullPath].add(str(currNodePath))
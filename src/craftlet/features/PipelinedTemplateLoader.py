@@ -0,0 +1,292 @@
+import asyncio
+import json
+import queue
+import tarfile
+import threading
+from contextlib import suppress
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from craftlet.features.CacheMirror import CacheMirrorClient
+from craftlet.features.StagedProjectWriter import StagedProjectWriter
+from craftlet.features.TemplatePluginConfiguration import configureTemplatePlugin
+from craftlet.models.PathExclusionTrie import PathExclusionTrie
+from craftlet.models.ProjectManifest import MANIFEST_DIR, MANIFEST_FILE, ProjectManifest
+from craftlet.utils.exceptions import CraftLetException
+from craftlet.utils.helperFunctions import CLIFunctions, GitFunction
+from craftlet.utils.mappers import repoUrlToOwnerAndName, repoUrlToTarballUrl
+from craftlet.utils.profiler import Profiler
+
+CHUNK_QUEUE_SIZE = 64
+MEMBER_QUEUE_SIZE = 32
+WRITER_COUNT = 4
+POLL_INTERVAL = 0.1
+END_OF_STREAM = None
+
+
+class ChunkQueueReader:
+    def __init__(self, chunkQueue: queue.Queue, abortEvent: threading.Event):
+        self.chunkQueue = chunkQueue
+        self.abortEvent = abortEvent
+        self.buffer = bytearray()
+        self.isExhausted = False
+
+    def nextChunk(self):
+        while not self.abortEvent.is_set():
+            try:
+                return self.chunkQueue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        raise InterruptedError("Template download was aborted")
+
+    def read(self, size: int = -1):
+        while not self.isExhausted and (size < 0 or len(self.buffer) < size):
+            chunk = self.nextChunk()
+            if chunk is END_OF_STREAM:
+                self.isExhausted = True
+            else:
+                self.buffer.extend(chunk)
+        if size < 0 or size > len(self.buffer):
+            size = len(self.buffer)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+
+class PipelinedTemplateLoader:
+    # Network, decompression and disk writes run as separate stages joined by bounded queues,
+    # so a slow stage blocks the one before it instead of letting data pile up in memory.
+    def __init__(
+        self,
+        repoUrl: str,
+        ref: str,
+        targetDir: Path,
+        generateEnv: bool,
+        manifest: ProjectManifest | None = None,
+        durable: bool = False,
+    ):
+        self.repoUrl = repoUrl
+        self.ref = ref
+        self.targetDir = targetDir
+        self.generateEnv = generateEnv
+        self.manifest = manifest
+        self.durable = durable
+        self.abortEvent = threading.Event()
+        # Set once plugin selection is done, for the parser thread and the writers respectively
+        self.selectionKnown = threading.Event()
+        self.selectionDone = asyncio.Event()
+        self.chunkQueue: queue.Queue = queue.Queue(maxsize=CHUNK_QUEUE_SIZE)
+        self.memberQueue: asyncio.Queue[Tuple[List[str], bytes] | None] = asyncio.Queue(maxsize=MEMBER_QUEUE_SIZE)
+        self.exclusions = PathExclusionTrie()
+        self.environmentVariables: Dict[str, str] = {}
+        self.writtenParts: List[List[str]] = []
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.configFuture: asyncio.Future[bytes | None] = self.loop.create_future()
+        with StagedProjectWriter(targetDir=self.targetDir, durable=self.durable) as self.writer:
+            try:
+                async with asyncio.TaskGroup() as taskGroup:
+                    taskGroup.create_task(self.produceChunks())
+                    taskGroup.create_task(asyncio.to_thread(self.parseMembers))
+                    taskGroup.create_task(self.configure())
+                    for _ in range(WRITER_COUNT):
+                        taskGroup.create_task(self.writeMembers())
+            except* Exception as errorGroup:
+                self.abortEvent.set()
+                cause = PipelinedTemplateLoader.findCause(errorGroup=errorGroup)
+                if isinstance(cause, CraftLetException):
+                    raise cause
+                raise CraftLetException(errorMessage=f"Loading the template failed: {cause!r}") from cause
+            except* BaseException:
+                self.abortEvent.set()
+                raise
+            # Members that arrived before templateConfig.json were written before the plugin selection was known
+            self.pruneExcluded()
+            if self.manifest is not None:
+                self.manifest.excludedPaths = self.exclusions.paths
+                self.writer.writeFile(relativeParts=[MANIFEST_DIR, MANIFEST_FILE], data=self.manifest.dumps())
+            if self.generateEnv:
+                self.writer.writeText(
+                    relativeParts=[".env"],
+                    text=("\n").join(f"{key}={value}" for key, value in self.environmentVariables.items()),
+                )
+
+    @staticmethod
+    def findCause(errorGroup: BaseExceptionGroup):
+        leaves = []
+        pendingGroups = [errorGroup]
+        while pendingGroups:
+            for error in pendingGroups.pop().exceptions:
+                if isinstance(error, BaseExceptionGroup):
+                    pendingGroups.append(error)
+                else:
+                    leaves.append(error)
+        # Stages that only stopped because another one failed report InterruptedError
+        for error in leaves:
+            if not isinstance(error, InterruptedError):
+                return error
+        return leaves[0]
+
+    def putChunk(self, chunk: bytes | None):
+        while not self.abortEvent.is_set():
+            try:
+                self.chunkQueue.put(chunk, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    async def produceChunks(self):
+        import httpx
+
+        tarballUrls = [repoUrlToTarballUrl(repoUrl=self.repoUrl, ref=self.ref)]
+        if CacheMirrorClient.isConfigured() and GitFunction.isCommitSha(ref=self.ref):
+            _, templateName = repoUrlToOwnerAndName(repoUrl=self.repoUrl)
+            tarballUrls.insert(0, CacheMirrorClient.getTemplateArchiveUrl(templateName=templateName, commitSha=self.ref))
+        hasQueuedChunk = False
+        try:
+            async with httpx.AsyncClient(follow_redirects=True) as client:
+                for tarballUrl in tarballUrls:
+                    isLastUrl = tarballUrl == tarballUrls[-1]
+                    try:
+                        with Profiler.phase("download", url=tarballUrl):
+                            async with client.stream("GET", tarballUrl) as response:
+                                # A mirror miss falls back to GitHub as long as no bytes were queued yet
+                                if response.status_code != 200 and not isLastUrl:
+                                    continue
+                                response.raise_for_status()
+                                async for chunk in response.aiter_bytes():
+                                    Profiler.addBytes("downloaded", len(chunk))
+                                    hasQueuedChunk = True
+                                    try:
+                                        self.chunkQueue.put_nowait(chunk)
+                                    except queue.Full:
+                                        await asyncio.to_thread(self.putChunk, chunk)
+                        return
+                    except httpx.TransportError:
+                        # Bytes of a partial mirror stream are already being parsed, another archive cannot follow them
+                        if isLastUrl or hasQueuedChunk:
+                            raise
+        finally:
+            await asyncio.to_thread(self.putChunk, END_OF_STREAM)
+
+    def putMember(self, member: Tuple[List[str], bytes] | None):
+        future = asyncio.run_coroutine_threadsafe(self.memberQueue.put(member), self.loop)
+        while True:
+            try:
+                return future.result(timeout=POLL_INTERVAL)
+            except TimeoutError:
+                if self.abortEvent.is_set():
+                    future.cancel()
+                    return
+
+    def setConfig(self, rawConfig: bytes | None):
+        if not self.configFuture.done():
+            self.configFuture.set_result(rawConfig)
+
+    def parseMembers(self):
+        reader = ChunkQueueReader(chunkQueue=self.chunkQueue, abortEvent=self.abortEvent)
+        try:
+            # "r|*" decompresses as the bytes arrive and detects the compression from the stream
+            with tarfile.open(fileobj=reader, mode="r|*") as tarStream:
+                for member in tarStream:
+                    if not member.isfile():
+                        continue
+                    relativeParts = member.name.split("/")[1:]
+                    if not relativeParts or ".." in relativeParts:
+                        continue
+                    # Unselected plugin members are skipped without being read once the selection is known
+                    if self.selectionKnown.is_set() and self.exclusions and self.exclusions.isExcluded(relativeParts):
+                        continue
+                    extractedFile = tarStream.extractfile(member)
+                    if extractedFile is None:
+                        continue
+                    memberBytes = extractedFile.read()
+                    if relativeParts[-1] == "templateConfig.json":
+                        if relativeParts == ["templateConfig.json"]:
+                            self.loop.call_soon_threadsafe(self.setConfig, memberBytes)
+                        continue
+                    self.putMember((relativeParts, memberBytes))
+        finally:
+            self.loop.call_soon_threadsafe(self.setConfig, None)
+            for _ in range(WRITER_COUNT):
+                self.putMember(END_OF_STREAM)
+
+    async def configure(self):
+        rawConfig = await self.configFuture
+        with Profiler.phase("config parse"):
+            templateConfig = json.loads(rawConfig.decode()) if rawConfig else {}
+
+        promptFuture: asyncio.Future[Tuple[Dict[str, str], PathExclusionTrie]] = self.loop.create_future()
+
+        def settle(result=None, error: BaseException | None = None):
+            if promptFuture.done():
+                return
+            if error is not None:
+                promptFuture.set_exception(error)
+            else:
+                promptFuture.set_result(result)
+
+        def promptConfig():
+            try:
+                with Profiler.phase("config prompts"):
+                    _, environmentVariables = CLIFunctions.buildConfigFromDict(dictFile=templateConfig)
+                if self.abortEvent.is_set():
+                    raise InterruptedError("Template download was aborted")
+                with Profiler.phase("plugin selection"):
+                    exclusions = configureTemplatePlugin(pluginDict=templateConfig.get("ProjectPlugin", {}))
+            except BaseException as error:
+                outcome = (None, error)
+            else:
+                outcome = ((environmentVariables, exclusions), None)
+            # The loop is already closed when the load failed while a prompt was still open
+            with suppress(RuntimeError):
+                self.loop.call_soon_threadsafe(settle, *outcome)
+
+        # Prompts run off the event loop so the download and writers keep going while the user answers.
+        # A daemon thread rather than the default executor, so a failed download is reported right away
+        # instead of waiting for a prompt that is still reading stdin.
+        threading.Thread(target=promptConfig, name="craftlet-prompts", daemon=True).start()
+        self.environmentVariables, self.exclusions = await promptFuture
+        self.selectionKnown.set()
+        self.selectionDone.set()
+
+    def writeFile(self, relativeParts: List[str], memberBytes: bytes):
+        with Profiler.phase("file write", path=("/").join(relativeParts)):
+            self.writer.writeFile(relativeParts=relativeParts, data=memberBytes)
+        if self.manifest is not None:
+            self.manifest.recordFile(relativePath=("/").join(relativeParts), data=memberBytes)
+
+    async def writeMembers(self):
+        while True:
+            member = await self.memberQueue.get()
+            if member is END_OF_STREAM:
+                return
+            relativeParts, memberBytes = member
+            # Members that arrive before templateConfig.json are written optimistically, since holding them
+            # back could fill the queue before the config is reached. Once it has arrived, writes wait for the
+            # plugin selection and the bounded queue holds the parser back meanwhile.
+            if self.configFuture.done() and not self.selectionDone.is_set():
+                await self.selectionDone.wait()
+            if self.exclusions and self.exclusions.isExcluded(relativeParts):
+                continue
+            self.writtenParts.append(relativeParts)
+            await asyncio.to_thread(self.writeFile, relativeParts, memberBytes)
+
+    def pruneExcluded(self):
+        if not self.exclusions:
+            return
+        stagingDir = self.writer.stagingDir
+        prunedDirs = set()
+        for relativeParts in self.writtenParts:
+            if self.exclusions.isExcluded(relativeParts):
+                self.writer.removeFile(relativeParts=relativeParts)
+                prunedDirs.update(stagingDir.joinpath(*relativeParts).parents)
+                if self.manifest is not None:
+                    self.manifest.files.pop(("/").join(relativeParts), None)
+        for prunedDir in sorted(prunedDirs, key=lambda path: len(path.parts), reverse=True):
+            if prunedDir.is_relative_to(stagingDir) and prunedDir != stagingDir:
+                try:
+                    prunedDir.rmdir()
+                except OSError:
+                    pass
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List
+
+import typer
+
+from craftlet.features.CacheMirror import CacheMirrorClient
+from craftlet.features.CraftLet import CraftLet
+from craftlet.features.CraftLetCache import CraftLetCache
+from craftlet.models.ProfileTemplate import ProfileTemplate
+from craftlet.utils.exceptions import CraftLetException
+from craftlet.utils.mappers import repoUrlToOwnerAndName
+from craftlet.utils.profiler import Profiler
+
+SYNC_CONCURRENCY = 8
+
+
+class ProfileCache:
+    @staticmethod
+    def getProfileDir(path: Path, profileName: str):
+        return path / "craftlet" / ".cache" / "profile" / profileName
+
+    @staticmethod
+    def getTemplatePath(profileDir: Path, alias: str, commitSha: str):
+        return profileDir / "template" / alias / commitSha
+
+    @staticmethod
+    def readManifest(manifestPath: Path):
+        try:
+            rawManifest = json.loads(manifestPath.read_text())
+        except FileNotFoundError:
+            raise CraftLetException(errorMessage=f"Profile manifest {manifestPath} doesn't exist")
+        except json.JSONDecodeError as error:
+            raise CraftLetException(errorMessage=f"Profile manifest {manifestPath} is not valid JSON: {error}")
+
+        templates: Dict[str, ProfileTemplate] = {}
+        for alias, entry in rawManifest.get("templates", {}).items():
+            if isinstance(entry, str):
+                entry = {"url": entry}
+            if "url" not in entry:
+                raise CraftLetException(errorMessage=f"Template {alias} in profile manifest has no url")
+            templates[alias] = ProfileTemplate(alias=alias, url=entry["url"], ref=entry.get("ref", "main"))
+        return templates
+
+    @staticmethod
+    def readLock(profileDir: Path):
+        import cbor2
+
+        lockPath = profileDir / "profile.lock"
+        if not lockPath.is_file():
+            return {}
+        return {
+            alias: ProfileTemplate(alias=alias, **entry) for alias, entry in cbor2.loads(lockPath.read_bytes()).items()
+        }
+
+    @staticmethod
+    def writeLock(profileDir: Path, lock: Dict[str, ProfileTemplate]):
+        import cbor2
+
+        rawLock = {
+            alias: {"url": entry.url, "ref": entry.ref, "commitSha": entry.commitSha} for alias, entry in lock.items()
+        }
+        tempPath = profileDir / "profile.lock.tmp"
+        tempPath.write_bytes(cbor2.dumps(rawLock))
+        tempPath.replace(profileDir / "profile.lock")
+
+    @staticmethod
+    async def resolveTemplate(template: ProfileTemplate, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            template.commitSha = await CraftLet.resolveGithubRef(repoUrl=template.url, ref=template.ref)
+
+    @staticmethod
+    def linkOrCopy(source: Path, destination: Path):
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copy2(source, destination)
+
+    @staticmethod
+    async def fetchTemplate(profileDir: Path, template: ProfileTemplate, semaphore: asyncio.Semaphore):
+        exactPath = ProfileCache.getTemplatePath(profileDir=profileDir, alias=template.alias, commitSha=template.commitSha)
+        _, repoName = repoUrlToOwnerAndName(repoUrl=template.url)
+        async with semaphore:
+            with Profiler.phase("profile fetch", template=template.alias):
+                # Prefer the shared offline cache, then the mirror, and only then GitHub
+                offlinePath = CraftLetCache.getCachedGithubTemplate(
+                    path=CraftLetCache.getCacheBasePath(), templateName=repoName, commitSha=template.commitSha
+                )
+                if offlinePath is not None:
+                    exactPath.mkdir(parents=True, exist_ok=True)
+                    for fileName in ("template.tar.gz", "template.sha256"):
+                        if (offlinePath / fileName).is_file() and not (exactPath / fileName).exists():
+                            ProfileCache.linkOrCopy(source=offlinePath / fileName, destination=exactPath / fileName)
+                    return "offline cache"
+                archiveBytes = await CacheMirrorClient.fetchTemplateArchive(
+                    templateName=repoName, commitSha=template.commitSha
+                )
+                if archiveBytes is not None:
+                    await asyncio.to_thread(CraftLetCache.writeTemplateArchive, exactPath, archiveBytes)
+                    return "mirror"
+                zipBytes = await CraftLet.getTemplateBytesGithub(
+                    repoUrl=template.url, ref=template.commitSha, useMirror=False
+                )
+                await asyncio.to_thread(CraftLetCache.writeZipAsTemplateArchive, exactPath, zipBytes, template.alias)
+                return "github"
+
+    @staticmethod
+    async def syncProfile(profileName: str, manifestPath: Path | None):
+        profileDir = ProfileCache.getProfileDir(path=CraftLetCache.getCacheBasePath(), profileName=profileName)
+        storedManifestPath = profileDir / "manifest.json"
+        if manifestPath is not None:
+            ProfileCache.readManifest(manifestPath=manifestPath)
+            profileDir.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(manifestPath, storedManifestPath)
+        elif not storedManifestPath.is_file():
+            raise CraftLetException(errorMessage=f"Profile {profileName} has no manifest, pass one with --manifest")
+
+        templates = ProfileCache.readManifest(manifestPath=storedManifestPath)
+        lock = ProfileCache.readLock(profileDir=profileDir)
+        semaphore = asyncio.Semaphore(SYNC_CONCURRENCY)
+        failures: List[str] = []
+        unresolvedAliases = set()
+
+        resolveResults = await asyncio.gather(
+            *(ProfileCache.resolveTemplate(template=template, semaphore=semaphore) for template in templates.values()),
+            return_exceptions=True,
+        )
+        for template, result in zip(list(templates.values()), resolveResults):
+            if isinstance(result, BaseException):
+                failures.append(f"{template.alias}: could not resolve {template.ref} ({result})")
+                unresolvedAliases.add(template.alias)
+                del templates[template.alias]
+
+        pending: List[ProfileTemplate] = []
+        for alias, template in templates.items():
+            lockedTemplate = lock.get(alias)
+            isCached = (
+                lockedTemplate is not None
+                and lockedTemplate.url == template.url
+                and lockedTemplate.commitSha == template.commitSha
+                and (
+                    ProfileCache.getTemplatePath(profileDir=profileDir, alias=alias, commitSha=template.commitSha)
+                    / "template.tar.gz"
+                ).is_file()
+            )
+            if isCached:
+                typer.echo(f"  = {alias}@{template.commitSha[:12]}")
+            else:
+                pending.append(template)
+
+        fetchResults = await asyncio.gather(
+            *(ProfileCache.fetchTemplate(profileDir=profileDir, template=template, semaphore=semaphore) for template in pending),
+            return_exceptions=True,
+        )
+        for template, result in zip(pending, fetchResults):
+            if isinstance(result, BaseException):
+                failures.append(f"{template.alias}: could not fetch {template.commitSha} ({result})")
+                continue
+            marker = "~" if template.alias in lock else "+"
+            typer.echo(f"  {marker} {template.alias}@{template.commitSha[:12]} (from {result})")
+            previousTemplate = lock.get(template.alias)
+            lock[template.alias] = template
+            if previousTemplate is not None and previousTemplate.commitSha != template.commitSha:
+                shutil.rmtree(
+                    ProfileCache.getTemplatePath(
+                        profileDir=profileDir, alias=template.alias, commitSha=previousTemplate.commitSha
+                    ),
+                    ignore_errors=True,
+                )
+
+        # Aliases that failed to resolve keep their last synced template
+        for alias in [alias for alias in lock if alias not in templates and alias not in unresolvedAliases]:
+            typer.echo(f"  - {alias}")
+            shutil.rmtree(profileDir / "template" / alias, ignore_errors=True)
+            del lock[alias]
+
+        profileDir.mkdir(parents=True, exist_ok=True)
+        ProfileCache.writeLock(profileDir=profileDir, lock=lock)
+        if failures:
+            raise CraftLetException(errorMessage=("\n").join([f"Profile {profileName} is partially synced:", *failures]))
+
+    @staticmethod
+    def resolveProfileTemplate(profileName: str, alias: str | None):
+        profileDir = ProfileCache.getProfileDir(path=CraftLetCache.getCacheBasePath(), profileName=profileName)
+        lock = ProfileCache.readLock(profileDir=profileDir)
+        if not lock:
+            raise CraftLetException(
+                errorMessage=f"Profile {profileName} is not synced, run: craftlet sync-profile {profileName}"
+            )
+        if alias is None:
+            if len(lock) != 1:
+                raise CraftLetException(
+                    errorMessage=f"Profile {profileName} has several templates, pick one with --template: {', '.join(sorted(lock))}"
+                )
+            alias = next(iter(lock))
+        template = lock.get(alias)
+        if template is None:
+            raise CraftLetException(
+                errorMessage=f"Profile {profileName} has no template {alias}, available: {', '.join(sorted(lock))}"
+            )
+        return ProfileCache.getTemplatePath(profileDir=profileDir, alias=alias, commitSha=template.commitSha), template
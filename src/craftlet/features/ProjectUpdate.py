@@ -0,0 +1,166 @@
+import tarfile
+from dataclasses import dataclass, field
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+from zipfile import ZipFile
+
+import typer
+
+from craftlet.features.CraftLet import CraftLet
+from craftlet.features.CraftLetCache import CraftLetCache
+from craftlet.models.PathExclusionTrie import PathExclusionTrie
+from craftlet.models.ProjectManifest import ProjectManifest
+from craftlet.utils.exceptions import CraftLetException
+from craftlet.utils.mappers import repoUrlToOwnerAndName
+from craftlet.utils.profiler import Profiler
+
+CONFLICT_SUFFIX = ".craftlet-new"
+
+
+@dataclass
+class UpdateReport:
+    updated: List[str] = field(default_factory=list)
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    conflicts: List[Tuple[str, str]] = field(default_factory=list)
+    sidecars: List[str] = field(default_factory=list)
+
+
+class ProjectUpdate:
+    @staticmethod
+    def iterZipMembers(zipBytes: bytes) -> Iterator[Tuple[List[str], bytes]]:
+        with ZipFile(BytesIO(zipBytes)) as zipObj:
+            for name in zipObj.namelist():
+                if not name.endswith("/"):
+                    yield name.split("/")[1:], zipObj.read(name)
+
+    @staticmethod
+    def iterTarMembers(tarFilePath: Path) -> Iterator[Tuple[List[str], bytes]]:
+        with tarfile.open(tarFilePath, "r|gz") as tarStream:
+            for member in tarStream:
+                extractedFile = tarStream.extractfile(member) if member.isfile() else None
+                if extractedFile is not None:
+                    yield member.name.split("/")[1:], extractedFile.read()
+
+    @staticmethod
+    async def getTemplateMembers(templateUrl: str, ref: str, commitSha: str):
+        import asyncio
+
+        _, templateName = repoUrlToOwnerAndName(repoUrl=templateUrl)
+        cacheBasePath = CraftLetCache.getCacheBasePath()
+        cachedTemplatePath = CraftLetCache.getCachedGithubTemplate(
+            path=cacheBasePath, templateName=templateName, commitSha=commitSha
+        )
+        if cachedTemplatePath is not None:
+            return ProjectUpdate.iterTarMembers(tarFilePath=cachedTemplatePath / "template.tar.gz")
+        zipBytes = await CraftLet.getTemplateBytesGithub(repoUrl=templateUrl, ref=commitSha)
+        # Stored under its commit so the next update of any project at this commit reads it locally
+        templateDir = CraftLetCache.getGithubTemplateDir(path=cacheBasePath, templateName=templateName)
+        await asyncio.to_thread(CraftLetCache.writeZipAsTemplateArchive, templateDir / commitSha, zipBytes, templateName)
+        CraftLetCache.recordGithubRef(templateDir=templateDir, ref=ref, commitSha=commitSha)
+        return ProjectUpdate.iterZipMembers(zipBytes=zipBytes)
+
+    @staticmethod
+    def writeFile(dest: Path, data: bytes):
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        Profiler.addBytes("written", dest.write_bytes(data))
+
+    @staticmethod
+    async def updateProject(projectDir: Path, ref: str | None, templateUrl: str | None, dryRun: bool):
+        manifest = ProjectManifest.load(projectDir=projectDir)
+        if manifest is None:
+            raise CraftLetException(errorMessage=f"{projectDir} has no CraftLet manifest, it was not created by load-template")
+        manifest.templateUrl = templateUrl or manifest.templateUrl
+        if manifest.templateUrl is None:
+            raise CraftLetException(errorMessage="The template URL of this project is unknown, pass it with --template-url")
+        manifest.ref = ref or manifest.ref
+
+        commitSha = await CraftLet.resolveGithubRef(repoUrl=manifest.templateUrl, ref=manifest.ref)
+        if commitSha == manifest.commitSha:
+            if not dryRun:
+                manifest.save(projectDir=projectDir)
+            return commitSha, None
+
+        exclusions = PathExclusionTrie()
+        for excludedPath in manifest.excludedPaths:
+            exclusions.addPath(excludedPath)
+        previousFiles = manifest.files
+        report = UpdateReport()
+        currentFiles: Dict[str, bytes] = {}
+
+        # Files whose template digest did not change are settled from the manifest alone,
+        # so only changed template files ever touch the project directory
+        with Profiler.phase("update diff"):
+            for relativeParts, memberBytes in await ProjectUpdate.getTemplateMembers(
+                templateUrl=manifest.templateUrl, ref=manifest.ref, commitSha=commitSha
+            ):
+                if not relativeParts or relativeParts[-1] == "templateConfig.json" or ".." in relativeParts:
+                    continue
+                if exclusions and exclusions.isExcluded(relativeParts):
+                    continue
+                relativePath = ("/").join(relativeParts)
+                templateDigest = ProjectManifest.digest(memberBytes)
+                previousDigest = previousFiles.get(relativePath)
+                currentFiles[relativePath] = templateDigest
+                if previousDigest == templateDigest:
+                    continue
+
+                dest = projectDir.joinpath(*relativeParts)
+                projectDigest = ProjectManifest.digestFile(filePath=dest)
+                if projectDigest == templateDigest:
+                    continue
+                if projectDigest == previousDigest:
+                    # Unmodified by the user (or absent in both versions), safe to overwrite
+                    (report.added if previousDigest is None else report.updated).append(relativePath)
+                    if not dryRun:
+                        ProjectUpdate.writeFile(dest=dest, data=memberBytes)
+                else:
+                    reason = "modified locally" if previousDigest is not None else "already exists locally"
+                    report.conflicts.append((relativePath, reason))
+                    if not dryRun:
+                        ProjectUpdate.writeFile(dest=dest.with_name(dest.name + CONFLICT_SUFFIX), data=memberBytes)
+                        report.sidecars.append(relativePath)
+
+        for relativePath, previousDigest in previousFiles.items():
+            if relativePath in currentFiles:
+                continue
+            dest = projectDir / relativePath
+            projectDigest = ProjectManifest.digestFile(filePath=dest)
+            if projectDigest is None:
+                continue
+            if projectDigest == previousDigest:
+                report.removed.append(relativePath)
+                if not dryRun:
+                    dest.unlink()
+            else:
+                report.conflicts.append((relativePath, "removed from the template but modified locally"))
+
+        if not dryRun:
+            manifest.commitSha = commitSha
+            manifest.files = currentFiles
+            manifest.save(projectDir=projectDir)
+        return commitSha, report
+
+    @staticmethod
+    def printReport(projectDir: Path, commitSha: str, report: UpdateReport | None, dryRun: bool):
+        if report is None:
+            typer.echo(f"✅ {projectDir.name} is already at {commitSha[:12]}")
+            return
+        prefix = "Would update" if dryRun else "Updated"
+        for relativePath in report.added:
+            typer.echo(f"  + {relativePath}")
+        for relativePath in report.updated:
+            typer.echo(f"  ~ {relativePath}")
+        for relativePath in report.removed:
+            typer.echo(f"  - {relativePath}")
+        for relativePath, reason in report.conflicts:
+            typer.echo(f"  ! {relativePath} ({reason})")
+        typer.echo(
+            f"✅ {prefix} {projectDir.name} to {commitSha[:12]}: {len(report.added)} added, "
+            f"{len(report.updated)} updated, {len(report.removed)} removed, {len(report.conflicts)} conflicts"
+        )
+        if report.sidecars:
+            typer.echo(
+                f"The template version was written next to each of these as *{CONFLICT_SUFFIX}: {', '.join(report.sidecars)}"
+            )
@@ -0,0 +1,148 @@
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Sequence, Set, Tuple
+
+import typer
+
+from craftlet.utils.exceptions import CraftLetException
+from craftlet.utils.hashUtils import timedSha256
+from craftlet.utils.profiler import Profiler
+
+JOURNAL_NAME = ".craftlet-journal"
+STAGING_SUFFIX = ".craftlet-staging"
+FLUSH_BATCH_SIZE = 64
+
+
+class StagedProjectWriter:
+    # Durable mode fsyncs staged files before the journal marks them complete
+    def __init__(self, targetDir: Path, durable: bool = False):
+        self.targetDir = targetDir
+        self.durable = durable
+        self.stagingDir = targetDir.with_name(f".{targetDir.name}{STAGING_SUFFIX}")
+        self.journalPath = self.stagingDir / JOURNAL_NAME
+        self.lock = threading.Lock()
+        self.completed: Dict[str, str] = {}
+        self.expected: Set[str] = set()
+        self.pending: List[Tuple[str, str, Path]] = []
+        self.resumedCount = 0
+
+    def __enter__(self):
+        if self.targetDir.exists() and any(self.targetDir.iterdir()):
+            raise CraftLetException(errorMessage=f"Project directory {self.targetDir} already exists")
+        if self.journalPath.is_file():
+            self.completed = StagedProjectWriter.readJournal(journalPath=self.journalPath)
+            if self.completed:
+                typer.echo(f"Resuming {self.targetDir.name}: {len(self.completed)} files were already written")
+        elif self.stagingDir.exists():
+            shutil.rmtree(self.stagingDir)
+        self.stagingDir.mkdir(parents=True, exist_ok=True)
+        self.journal = open(self.journalPath, "a", encoding="utf-8")
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType is not None:
+            # The staging directory and its journal are kept so the next run resumes from here
+            with self.lock:
+                self.flush()
+            self.journal.close()
+            return False
+        self.commit()
+        return False
+
+    @staticmethod
+    def readJournal(journalPath: Path):
+        completed: Dict[str, str] = {}
+        # Everything after the last newline is a torn write from a crash and is ignored
+        for line in journalPath.read_text(encoding="utf-8").split("\n")[:-1]:
+            digest, _, relativePath = line.partition("\t")
+            completed[relativePath] = digest
+        return completed
+
+    @staticmethod
+    def fsyncPath(path: Path, flags: int = os.O_RDWR):
+        fileDescriptor = os.open(path, flags)
+        try:
+            os.fsync(fileDescriptor)
+        finally:
+            os.close(fileDescriptor)
+
+    @staticmethod
+    def fsyncDirectory(path: Path):
+        try:
+            StagedProjectWriter.fsyncPath(path=path, flags=os.O_RDONLY)
+        except OSError:
+            # Directories cannot be opened for fsync on every platform (e.g. Windows)
+            pass
+
+    def writeFile(self, relativeParts: Sequence[str], data: bytes):
+        relativePath = ("/").join(relativeParts)
+        digest = timedSha256(data).hexdigest()
+        dest = self.stagingDir.joinpath(*relativeParts)
+        with self.lock:
+            self.expected.add(relativePath)
+            if self.completed.get(relativePath) == digest and dest.is_file():
+                self.resumedCount += 1
+                return
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        Profiler.addBytes("written", dest.write_bytes(data))
+        with self.lock:
+            self.pending.append((relativePath, digest, dest))
+            if len(self.pending) >= FLUSH_BATCH_SIZE:
+                self.flush()
+
+    def writeText(self, relativeParts: Sequence[str], text: str):
+        self.writeFile(relativeParts=relativeParts, data=text.encode())
+
+    def removeFile(self, relativeParts: Sequence[str]):
+        relativePath = ("/").join(relativeParts)
+        with self.lock:
+            self.expected.discard(relativePath)
+        self.stagingDir.joinpath(*relativeParts).unlink(missing_ok=True)
+
+    def flush(self):
+        # Callers hold self.lock
+        if not self.pending:
+            return
+        if self.durable:
+            with Profiler.phase("fsync batch", files=len(self.pending)):
+                dirtyDirs = set()
+                for _, _, dest in self.pending:
+                    StagedProjectWriter.fsyncPath(path=dest)
+                    for parentDir in dest.parents:
+                        dirtyDirs.add(parentDir)
+                        if parentDir == self.stagingDir:
+                            break
+                # Each directory entry is flushed once per batch instead of once per file
+                for dirtyDir in dirtyDirs:
+                    StagedProjectWriter.fsyncDirectory(path=dirtyDir)
+        for relativePath, digest, _ in self.pending:
+            self.completed[relativePath] = digest
+            self.journal.write(f"{digest}\t{relativePath}\n")
+        self.journal.flush()
+        if self.durable:
+            os.fsync(self.journal.fileno())
+        self.pending.clear()
+
+    def commit(self):
+        with self.lock:
+            self.flush()
+        self.journal.close()
+        self.journalPath.unlink()
+        # Files this run did not write: wanted by an earlier run only (e.g. a plugin deselected on retry),
+        # or staged by a run that crashed before journaling them
+        strayDirs = set()
+        for stagedPath in [path for path in self.stagingDir.rglob("*") if not path.is_dir()]:
+            if stagedPath.relative_to(self.stagingDir).as_posix() not in self.expected:
+                stagedPath.unlink()
+                strayDirs.update(stagedPath.parents)
+        for strayDir in sorted(strayDirs, key=lambda path: len(path.parts), reverse=True):
+            if strayDir.is_relative_to(self.stagingDir) and strayDir != self.stagingDir and not any(strayDir.iterdir()):
+                strayDir.rmdir()
+        if self.targetDir.is_dir():
+            self.targetDir.rmdir()
+        with Profiler.phase("staging rename"):
+            os.replace(self.stagingDir, self.targetDir)
+        if self.durable:
+            StagedProjectWriter.fsyncDirectory(path=self.targetDir.parent)
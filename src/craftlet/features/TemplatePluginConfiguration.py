@@ -1,19 +1,25 @@
-from pathlib import Path
 from typing import Dict, List, Tuple
 
 from rich.console import Console
 
+from craftlet.models.PathExclusionTrie import PathExclusionTrie
 from craftlet.utils.ui.CliRadioButton import cliRadioButton
 
 
 def configureTemplatePlugin(pluginDict: Dict[str, Dict]):
+    unSelectedPluginsPaths = PathExclusionTrie()
+    if not pluginDict:
+        return unSelectedPluginsPaths
     richConsole = Console()
     availablePluginOptions: List[Tuple[str, List[List[str]]]] = []
     pluginAbouts = []
+    pluginPaths: Dict[str, List[str]] = {}
     for pluginName in pluginDict.keys():
         pluginAbout: str = pluginDict.get(pluginName, {}).get("about", "No Description")
-        availablePluginOptions.append((pluginName, pluginDict.get(pluginName, {}).get("modulePath", [])))
+        modulePaths: List[List[str]] = pluginDict.get(pluginName, {}).get("modulePath", [])
+        availablePluginOptions.append((pluginName, modulePaths))
         pluginAbouts.append(pluginAbout)
+        pluginPaths[pluginName] = [('/').join(pathList) for pathList in modulePaths]
 
     selectedPlugins, unSelectedPlugins = cliRadioButton(
         options=availablePluginOptions,
@@ -22,9 +28,7 @@ def configureTemplatePlugin(pluginDict: Dict[str, Dict]):
         abouts=pluginAbouts,
     )
 
-    unSelectedPluginsPaths = set()
-    for i in range(len(unSelectedPlugins)):
-        for pathList in unSelectedPlugins[i][1]:
-            modulePath = Path(('/').join(pathList))
-            unSelectedPluginsPaths.add(modulePath)
+    for pluginName, _ in unSelectedPlugins:
+        for modulePath in pluginPaths[pluginName]:
+            unSelectedPluginsPaths.addPath(modulePath)
     return unSelectedPluginsPaths
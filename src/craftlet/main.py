@@ -1,6 +1,34 @@
+from pathlib import Path
+
 import typer
 
 from craftlet.cli.CraftLetCLI import craftletCliApp
+from craftlet.utils.profiler import Profiler
 
 app = typer.Typer(name="CraftLet", help="Entry Point of CraftLet CLI tool")
 app.add_typer(craftletCliApp)
+
+
+@app.callback()
+def main(
+    ctx: typer.Context,
+    timings: bool = typer.Option(default=False, help="Print a summary of phase timings, bytes moved and peak memory"),
+    profile: Path = typer.Option(
+        default=None, help="Print the timings summary and write a Chrome trace (JSON) of every phase to this file"
+    ),
+):
+    if not (timings or profile):
+        return
+    Profiler.enable()
+
+    def reportTimings():
+        typer.echo(Profiler.summary(), err=True)
+        if profile is not None:
+            Profiler.writeChromeTrace(tracePath=profile)
+            typer.echo(f"Chrome trace written to {profile}", err=True)
+
+    ctx.call_on_close(reportTimings)
+
+
+if __name__ == "__main__":
+    app()
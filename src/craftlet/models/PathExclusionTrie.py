@@ -0,0 +1,85 @@
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+GLOB_CHARACTERS = set("*?[")
+
+
+@dataclass
+class PathExclusionTrieNode:
+    isExcluded: bool = False
+    isRecursiveGlob: bool = False
+    children: Dict[str, "PathExclusionTrieNode"] = field(default_factory=dict)
+    globChildren: List[Tuple[str, "PathExclusionTrieNode"]] = field(default_factory=list)
+    recursiveGlobChild: "PathExclusionTrieNode | None" = None
+
+
+class PathExclusionTrie:
+    def __init__(self):
+        self.root = PathExclusionTrieNode()
+        self.size = 0
+        self.paths: List[str] = []
+
+    def __len__(self):
+        return self.size
+
+    def add(self, parts: Sequence[str]):
+        currNode = self.root
+        for part in parts:
+            if part == "**":
+                if currNode.recursiveGlobChild is None:
+                    currNode.recursiveGlobChild = PathExclusionTrieNode(isRecursiveGlob=True)
+                currNode = currNode.recursiveGlobChild
+            elif GLOB_CHARACTERS.intersection(part):
+                for pattern, globNode in currNode.globChildren:
+                    if pattern == part:
+                        currNode = globNode
+                        break
+                else:
+                    globNode = PathExclusionTrieNode()
+                    currNode.globChildren.append((part, globNode))
+                    currNode = globNode
+            else:
+                currNode = currNode.children.setdefault(part, PathExclusionTrieNode())
+        if not currNode.isExcluded:
+            currNode.isExcluded = True
+            self.size += 1
+
+    def addPath(self, path: str):
+        parts = [part for part in path.split("/") if part and part != "."]
+        # An empty module path would exclude the template root, i.e. every file
+        if not parts:
+            return
+        self.paths.append(path)
+        self.add(parts)
+
+    @staticmethod
+    def expand(nodes: Iterable[PathExclusionTrieNode]):
+        # "**" may match zero segments, so a node with a recursive glob child also stands for that child
+        expanded = []
+        for node in nodes:
+            while node is not None:
+                expanded.append(node)
+                node = node.recursiveGlobChild
+        return expanded
+
+    def isExcluded(self, parts: Sequence[str]):
+        # An excluded node excludes its whole subtree, so the walk stops at the first one it reaches
+        activeNodes = [self.root]
+        for part in parts:
+            nextNodes = []
+            for node in PathExclusionTrie.expand(activeNodes):
+                if node.isExcluded:
+                    return True
+                child = node.children.get(part)
+                if child is not None:
+                    nextNodes.append(child)
+                for pattern, globNode in node.globChildren:
+                    if fnmatchcase(part, pattern):
+                        nextNodes.append(globNode)
+                if node.isRecursiveGlob:
+                    nextNodes.append(node)
+            if not nextNodes:
+                return False
+            activeNodes = nextNodes
+        return any(node.isExcluded for node in PathExclusionTrie.expand(activeNodes))
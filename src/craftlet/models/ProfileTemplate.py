@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class ProfileTemplate:
+    alias: str
+    url: str
+    ref: str = "main"
+    commitSha: str | None = None
@@ -0,0 +1,61 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+from craftlet.utils.hashUtils import timedFileSha256, timedSha256
+
+MANIFEST_DIR = ".craftlet"
+MANIFEST_FILE = "manifest.cbor"
+
+
+@dataclass
+class ProjectManifest:
+    templateUrl: str | None
+    ref: str
+    commitSha: str | None
+    excludedPaths: List[str] = field(default_factory=list)
+    files: Dict[str, bytes] = field(default_factory=dict)
+
+    @staticmethod
+    def digest(data: bytes):
+        return timedSha256(data).digest()
+
+    @staticmethod
+    def digestFile(filePath: Path):
+        try:
+            with open(filePath, "rb") as fileObj:
+                return timedFileSha256(fileObj).digest()
+        except FileNotFoundError:
+            return None
+
+    def recordFile(self, relativePath: str, data: bytes):
+        self.files[relativePath] = ProjectManifest.digest(data)
+
+    def dumps(self):
+        import cbor2
+
+        return cbor2.dumps(
+            {
+                "templateUrl": self.templateUrl,
+                "ref": self.ref,
+                "commitSha": self.commitSha,
+                "excludedPaths": self.excludedPaths,
+                "files": self.files,
+            }
+        )
+
+    def save(self, projectDir: Path):
+        manifestDir = projectDir / MANIFEST_DIR
+        manifestDir.mkdir(parents=True, exist_ok=True)
+        tempPath = manifestDir / f"{MANIFEST_FILE}.tmp"
+        tempPath.write_bytes(self.dumps())
+        tempPath.replace(manifestDir / MANIFEST_FILE)
+
+    @staticmethod
+    def load(projectDir: Path):
+        import cbor2
+
+        manifestPath = projectDir / MANIFEST_DIR / MANIFEST_FILE
+        if not manifestPath.is_file():
+            return None
+        return ProjectManifest(**cbor2.loads(manifestPath.read_bytes()))
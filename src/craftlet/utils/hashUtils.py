@@ -1,17 +1,45 @@
-from _hashlib import HASH
+import hashlib
+from collections.abc import Buffer
 from io import BufferedWriter
-from typing import BinaryIO
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, BinaryIO
 
-from typing_extensions import Buffer
+from craftlet.utils.profiler import Profiler
+
+if TYPE_CHECKING:
+    from _hashlib import HASH
+
+
+def timedSha256(data: Buffer):
+    if not Profiler.enabled:
+        return hashlib.sha256(data)
+    startNs = perf_counter_ns()
+    hashObj = hashlib.sha256(data)
+    Profiler.accumulate(name="hash", durationNs=perf_counter_ns() - startNs)
+    return hashObj
+
+
+def timedFileSha256(fileObj: BinaryIO):
+    if not Profiler.enabled:
+        return hashlib.file_digest(fileObj, "sha256")
+    startNs = perf_counter_ns()
+    hashObj = hashlib.file_digest(fileObj, "sha256")
+    Profiler.accumulate(name="hash", durationNs=perf_counter_ns() - startNs)
+    return hashObj
 
 
 class HashWriter(BinaryIO):
-    def __init__(self, rawWriter: BufferedWriter, hashWriter: HASH):
+    def __init__(self, rawWriter: BufferedWriter, hashWriter: "HASH"):
         self.rawWriter = rawWriter
         self.hashWriter = hashWriter
 
     def write(self, data: Buffer):
-        self.hashWriter.update(data)
+        if Profiler.enabled:
+            startNs = perf_counter_ns()
+            self.hashWriter.update(data)
+            Profiler.accumulate(name="hash", durationNs=perf_counter_ns() - startNs)
+        else:
+            self.hashWriter.update(data)
         return self.rawWriter.write(data)
 
     def flush(self):
@@ -66,3 +66,12 @@ class CacheFunction:
                 return Path.home() / "Library" / "Caches"
             case _:
                 return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+
+
+class GitFunction:
+    COMMIT_SHA_LENGTHS = {40, 64}
+    HEX_DIGITS = set("0123456789abcdef")
+
+    @staticmethod
+    def isCommitSha(ref: str):
+        return len(ref) in GitFunction.COMMIT_SHA_LENGTHS and set(ref.lower()) <= GitFunction.HEX_DIGITS
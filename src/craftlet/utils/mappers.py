@@ -1,14 +1,38 @@
-from cbor2 import CBOREncoder
+import os
+from typing import TYPE_CHECKING, Tuple
 
 from craftlet.models.Cacheable import Cacheable
 
+if TYPE_CHECKING:
+    from cbor2 import CBOREncoder
 
-def repoUrlToZipUrl(repoUrl: str):
-    zipUrl = (
-        repoUrl.replace("github.com", "codeload.github.com") + "/zip/refs/heads/main"
-    )
+GITHUB_CODELOAD_URL = os.environ.get("CRAFTLET_GITHUB_CODELOAD_URL", "https://codeload.github.com")
+GITHUB_API_URL = os.environ.get("CRAFTLET_GITHUB_API_URL", "https://api.github.com")
+
+
+def repoUrlToOwnerAndName(repoUrl: str) -> Tuple[str, str]:
+    ownerName, templateName = repoUrl.rstrip("/").removesuffix(".git").split("/")[-2:]
+    return ownerName, templateName
+
+
+def repoUrlToZipUrl(repoUrl: str, ref: str = "main"):
+    ownerName, templateName = repoUrlToOwnerAndName(repoUrl=repoUrl)
+    zipUrl = f"{GITHUB_CODELOAD_URL}/{ownerName}/{templateName}/zip/{ref}"
     return zipUrl
 
 
-def cborGithubTemplateReferenceEncoder(encoder: CBOREncoder, data: Cacheable):
-    encoder.encode({0: data.coreData})
+def repoUrlToTarballUrl(repoUrl: str, ref: str = "main"):
+    ownerName, templateName = repoUrlToOwnerAndName(repoUrl=repoUrl)
+    tarballUrl = f"{GITHUB_CODELOAD_URL}/{ownerName}/{templateName}/tar.gz/{ref}"
+    return tarballUrl
+
+
+def repoUrlToCommitUrl(repoUrl: str, ref: str):
+    ownerName, templateName = repoUrlToOwnerAndName(repoUrl=repoUrl)
+    commitUrl = f"{GITHUB_API_URL}/repos/{ownerName}/{templateName}/commits/{ref}"
+    return commitUrl
+
+
+def cborGithubTemplateReferenceEncoder(encoder: "CBOREncoder", data: Cacheable):
+    ref = data.payload.get("ref", "main") if data.payload else "main"
+    encoder.encode({0: data.coreData, 1: ref})
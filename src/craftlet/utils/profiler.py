@@ -0,0 +1,113 @@
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, ClassVar, Dict, List
+
+NULL_PHASE = nullcontext()
+
+
+class ProfilePhase:
+    def __init__(self, name: str, args: Dict[str, Any]):
+        self.name = name
+        self.args = args
+        self.startNs = 0
+
+    def __enter__(self):
+        self.startNs = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *excInfo):
+        Profiler.record(name=self.name, startNs=self.startNs, endNs=time.perf_counter_ns(), args=self.args)
+        return False
+
+
+class Profiler:
+    enabled: ClassVar[bool] = False
+    originNs: ClassVar[int] = 0
+    events: ClassVar[List[Dict[str, Any]]] = []
+    phaseTotals: ClassVar[Dict[str, List[int]]] = defaultdict(lambda: [0, 0])
+    byteCounters: ClassVar[Dict[str, int]] = defaultdict(int)
+    lock: ClassVar[threading.Lock] = threading.Lock()
+
+    @staticmethod
+    def enable():
+        Profiler.enabled = True
+        Profiler.originNs = time.perf_counter_ns()
+
+    @staticmethod
+    def phase(name: str, **args: Any):
+        if not Profiler.enabled:
+            return NULL_PHASE
+        return ProfilePhase(name=name, args=args)
+
+    @staticmethod
+    def record(name: str, startNs: int, endNs: int, args: Dict[str, Any] | None = None):
+        with Profiler.lock:
+            Profiler.events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (startNs - Profiler.originNs) / 1000,
+                    "dur": (endNs - startNs) / 1000,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": args or {},
+                }
+            )
+            Profiler.phaseTotals[name][0] += 1
+            Profiler.phaseTotals[name][1] += endNs - startNs
+
+    @staticmethod
+    def accumulate(name: str, durationNs: int):
+        # For hot loops (e.g. per chunk hashing) where one trace event per call is too noisy
+        with Profiler.lock:
+            Profiler.phaseTotals[name][0] += 1
+            Profiler.phaseTotals[name][1] += durationNs
+
+    @staticmethod
+    def addBytes(counter: str, size: int):
+        if Profiler.enabled:
+            with Profiler.lock:
+                Profiler.byteCounters[counter] += size
+
+    @staticmethod
+    def peakMemoryBytes():
+        try:
+            import resource
+        except ImportError:
+            return None
+        peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+        return peakRss if sys.platform == "darwin" else peakRss * 1024
+
+    @staticmethod
+    def summary():
+        lines = ["", "⏱  CraftLet timings", f"{'phase':<32}{'calls':>8}{'total ms':>12}"]
+        for name, (calls, totalNs) in sorted(Profiler.phaseTotals.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<32}{calls:>8}{totalNs / 1e6:>12.2f}")
+        if Profiler.byteCounters:
+            lines.append("")
+            for counter, size in sorted(Profiler.byteCounters.items()):
+                lines.append(f"{counter + ' bytes':<32}{size:>20,}")
+        peakMemory = Profiler.peakMemoryBytes()
+        if peakMemory is not None:
+            lines.append(f"{'peak memory (RSS)':<32}{peakMemory / (1024 * 1024):>17.1f} MB")
+        return ("\n").join(lines)
+
+    @staticmethod
+    def writeChromeTrace(tracePath: Path):
+        import json
+
+        trace = {
+            "traceEvents": Profiler.events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "bytes": dict(Profiler.byteCounters),
+                "peakMemoryBytes": Profiler.peakMemoryBytes(),
+            },
+        }
+        tracePath.write_text(json.dumps(trace))
@@ -1,4 +1,4 @@
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import readchar
 from readchar import key as rkey
@@ -7,51 +7,191 @@ from rich.console import Console
 from rich.live import Live
 from rich.panel import Panel
 from rich.table import Table
+from rich.text import Text
 
+# Lines taken by the panel borders, paddings and subtitle around the option rows
+CHROME_HEIGHT = 8
+MIN_WINDOW_SIZE = 5
 
-def render(
-    options: List[Tuple[str, List[List[str]]]],
-    current: int,
-    selected: set,
-    title: str,
-    abouts: List[str] | None = None,
-):
-    optsTable = Table.grid(expand=True)
-    optsTable.add_column(justify="right", width=4)
-    optsTable.add_column(ratio=1)
-
-    for i, (opt, _) in enumerate(options, 1):
-        mark = "[bold green]✔[/]" if i in selected else "○"
-        row = f"{mark}  {opt}"
-        if i - 1 == current:
-            row = f"[reverse]{row}[/reverse]"
-        optsTable.add_row(f"{i}.", row)
-
-    aboutText = "No description."
-    if abouts and 0 <= current < len(abouts):
-        aboutText = abouts[current] or "No description."
-
-    aboutPanel = Panel(
-        aboutText,
-        title="About",
-        padding=(1, 2),
-        box=box.ROUNDED,
-        expand=True,
-    )
 
-    outer = Table.grid(expand=True)
-    outer.add_column(ratio=2)
-    outer.add_column(ratio=3)
-    outer.add_row(optsTable, aboutPanel)
-
-    return Panel(
-        outer,
-        title=title,
-        subtitle="↑/↓ move • Space toggle • Enter confirm • q quit",
-        padding=(1, 2),
-        box=box.ROUNDED,
-        expand=True,
-    )
+class VirtualizedMultiSelect:
+    def __init__(
+        self,
+        options: List[Tuple[str, List[List[str]]]],
+        title: str,
+        richConsole: Console,
+        abouts: Optional[List[str]] = None,
+    ):
+        self.options = options
+        self.title = title
+        self.richConsole = richConsole
+        self.abouts = abouts
+        self.lowerNames = [name.lower() for name, _ in options]
+        self.selected: set[int] = set(range(len(options)))
+        self.unSelected: set[int] = set()
+        self.filterQuery = ""
+        self.filterHistory: List[List[int]] = []
+        self.filtered: List[int] = list(range(len(options)))
+        self.isTypingFilter = False
+        self.cursor = 0
+        self.windowStart = 0
+        self.rowCache: Dict[int, Tuple[Tuple[bool, bool], Text]] = {}
+
+    @property
+    def windowSize(self):
+        return max(MIN_WINDOW_SIZE, self.richConsole.size.height - CHROME_HEIGHT)
+
+    @property
+    def currentIndex(self):
+        return self.filtered[self.cursor] if self.filtered else None
+
+    def moveCursor(self, step: int):
+        if not self.filtered:
+            return
+        self.cursor = (self.cursor + step) % len(self.filtered)
+        if self.cursor < self.windowStart:
+            self.windowStart = self.cursor
+        elif self.cursor >= self.windowStart + self.windowSize:
+            self.windowStart = self.cursor - self.windowSize + 1
+
+    def toggleCurrent(self):
+        index = self.currentIndex
+        if index is None:
+            return
+        if index in self.selected:
+            self.selected.remove(index)
+            self.unSelected.add(index)
+        else:
+            self.unSelected.remove(index)
+            self.selected.add(index)
+
+    def deselectAll(self):
+        self.selected.clear()
+        self.unSelected = set(range(len(self.options)))
+
+    def pushFilterChar(self, char: str):
+        # Narrow the current matches instead of rescanning every option
+        self.filterHistory.append(self.filtered)
+        self.filterQuery += char.lower()
+        self.filtered = [index for index in self.filtered if self.filterQuery in self.lowerNames[index]]
+        self.resetCursor()
+
+    def popFilterChar(self):
+        if not self.filterHistory:
+            return
+        self.filterQuery = self.filterQuery[:-1]
+        self.filtered = self.filterHistory.pop()
+        self.resetCursor()
+
+    def clearFilter(self):
+        if self.filterHistory:
+            self.filtered = self.filterHistory[0]
+        self.filterHistory.clear()
+        self.filterQuery = ""
+        self.resetCursor()
+
+    def resetCursor(self):
+        self.cursor = 0
+        self.windowStart = 0
+
+    def renderRow(self, index: int, isCurrent: bool):
+        rowState = (index in self.selected, isCurrent)
+        cachedRow = self.rowCache.get(index)
+        if cachedRow is not None and cachedRow[0] == rowState:
+            return cachedRow[1]
+        isSelected, _ = rowState
+        row = Text()
+        if isSelected:
+            row.append("✔", style="bold green")
+        else:
+            row.append("○")
+        row.append(f"  {self.options[index][0]}")
+        if isCurrent:
+            row.stylize("reverse")
+        self.rowCache[index] = (rowState, row)
+        return row
+
+    def render(self):
+        optsTable = Table.grid(expand=True)
+        optsTable.add_column(justify="right", width=len(str(len(self.options))) + 2)
+        optsTable.add_column(ratio=1)
+
+        windowEnd = min(len(self.filtered), self.windowStart + self.windowSize)
+        for position in range(self.windowStart, windowEnd):
+            index = self.filtered[position]
+            optsTable.add_row(f"{index + 1}.", self.renderRow(index=index, isCurrent=position == self.cursor))
+        if not self.filtered:
+            optsTable.add_row("", Text("No plugin matches the filter", style="dim"))
+
+        aboutText = "No description."
+        index = self.currentIndex
+        if self.abouts and index is not None and index < len(self.abouts):
+            aboutText = self.abouts[index] or "No description."
+
+        aboutPanel = Panel(
+            aboutText,
+            title="About",
+            padding=(1, 2),
+            box=box.ROUNDED,
+            expand=True,
+        )
+
+        outer = Table.grid(expand=True)
+        outer.add_column(ratio=2)
+        outer.add_column(ratio=3)
+        outer.add_row(optsTable, aboutPanel)
+
+        filterStatus = f"filter: {self.filterQuery}{'▏' if self.isTypingFilter else ''}"
+        return Panel(
+            outer,
+            title=f"{self.title} ({len(self.selected)}/{len(self.options)} selected • {filterStatus})",
+            subtitle="↑/↓ move • Space toggle • / filter • Esc clear • Enter confirm • q quit",
+            padding=(1, 2),
+            box=box.ROUNDED,
+            expand=True,
+        )
+
+    def handleKey(self, key: str):
+        if key == rkey.UP:
+            self.moveCursor(-1)
+        elif key == rkey.DOWN:
+            self.moveCursor(1)
+        elif key == rkey.ESC:
+            self.isTypingFilter = False
+            self.clearFilter()
+        elif self.isTypingFilter:
+            # Typed before Space so plugin names containing spaces can be searched
+            if key in (rkey.ENTER, rkey.CR):
+                self.isTypingFilter = False
+            elif key == rkey.BACKSPACE:
+                self.popFilterChar()
+            elif len(key) == 1 and key.isprintable():
+                self.pushFilterChar(key)
+        elif key == rkey.SPACE:
+            self.toggleCurrent()
+        elif key == "/":
+            self.isTypingFilter = True
+        elif key in (rkey.ENTER, rkey.CR):
+            return False
+        elif key.lower() == "q":
+            self.deselectAll()
+            return False
+        return True
+
+    def run(self):
+        try:
+            with Live(self.render(), console=self.richConsole, auto_refresh=False) as live:
+                while True:
+                    try:
+                        key = readchar.readkey()
+                    except KeyboardInterrupt:
+                        self.deselectAll()
+                        break
+                    if not self.handleKey(key):
+                        break
+                    live.update(self.render(), refresh=True)
+        except KeyboardInterrupt:
+            self.deselectAll()
 
 
 def multiSelect(
@@ -60,48 +200,12 @@ def multiSelect(
     richConsole: Console,
     abouts: Optional[List[str]] = None,
 ) -> Tuple[List[Tuple[str, List[List[str]]]], List[Tuple[str, List[List[str]]]]]:
-    current = 0
-    selected: set[int] = set(range(1, len(options) + 1))
-
-    try:
-        with Live(
-            render(options, current, selected, title, abouts),
-            console=richConsole,
-            refresh_per_second=20,
-        ) as live:
-            while True:
-                try:
-                    key = readchar.readkey()
-                except KeyboardInterrupt:
-                    selected.clear()
-                    break
-
-                if key == rkey.UP:
-                    current = (current - 1) % len(options)
-                elif key == rkey.DOWN:
-                    current = (current + 1) % len(options)
-                elif key == rkey.SPACE:
-                    idx = current + 1
-                    if idx in selected:
-                        selected.remove(idx)
-                    else:
-                        selected.add(idx)
-                elif key in (rkey.ENTER, rkey.CR):
-                    break
-                elif key.lower() == "q":
-                    selected.clear()
-                    break
-
-                live.update(render(options, current, selected, title, abouts))
-    except KeyboardInterrupt:
-        selected.clear()
-    selectedOptions = []
-    unSelectedOptions = []
-    for i in range(1, len(options) + 1):
-        if i in selected:
-            selectedOptions.append(options[i - 1])
-        else:
-            unSelectedOptions.append(options[i - 1])
+    if not options:
+        return [], []
+    selector = VirtualizedMultiSelect(options=options, title=title, richConsole=richConsole, abouts=abouts)
+    selector.run()
+    selectedOptions = [options[i] for i in sorted(selector.selected)]
+    unSelectedOptions = [options[i] for i in sorted(selector.unSelected)]
     return selectedOptions, unSelectedOptions
 
 
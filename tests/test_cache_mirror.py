@@ -0,0 +1,152 @@
+import asyncio
+import socket
+import tempfile
+import unittest
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+from zipfile import ZipFile
+
+import cbor2
+import httpx
+
+from craftlet.features.CacheMirror import GITHUB_TEMPLATE_PREFIX, CacheMirrorClient, CacheMirrorServer
+from craftlet.features.CraftLet import CraftLet
+from craftlet.utils import mappers
+
+COMMIT_SHA = "a" * 40
+ARCHIVE_BYTES = bytes(range(256)) * 40
+
+
+class CacheMirrorTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        cacheDir = tempfile.TemporaryDirectory()
+        self.addCleanup(cacheDir.cleanup)
+        self.cacheRoot = Path(cacheDir.name)
+        self.templateDir = self.cacheRoot / GITHUB_TEMPLATE_PREFIX / "demo"
+        (self.templateDir / COMMIT_SHA).mkdir(parents=True)
+        (self.templateDir / COMMIT_SHA / "template.tar.gz").write_bytes(ARCHIVE_BYTES)
+        (self.templateDir / "refs.cbor").write_bytes(cbor2.dumps({"main": COMMIT_SHA}))
+        self.mirrorUrl = await self.startServer(cacheRoot=self.cacheRoot)
+        self.archivePath = f"/{GITHUB_TEMPLATE_PREFIX}/demo/{COMMIT_SHA}/template.tar.gz"
+
+    async def startServer(self, cacheRoot: Path):
+        mirrorServer = CacheMirrorServer(cacheRoot=cacheRoot, host="127.0.0.1", port=0)
+        server = await asyncio.start_server(mirrorServer.handleClient, "127.0.0.1", 0)
+        self.addAsyncCleanup(server.wait_closed)
+        self.addCleanup(server.close)
+        return f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+    async def get(self, path: str, headers: dict | None = None):
+        async with httpx.AsyncClient() as client:
+            return await client.get(self.mirrorUrl + path, headers=headers)
+
+    async def test_serves_whole_file(self):
+        response = await self.get(self.archivePath)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, ARCHIVE_BYTES)
+        self.assertEqual(response.headers["accept-ranges"], "bytes")
+
+    async def test_serves_byte_ranges(self):
+        response = await self.get(self.archivePath, headers={"Range": "bytes=10-19"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, ARCHIVE_BYTES[10:20])
+        self.assertEqual(response.headers["content-range"], f"bytes 10-19/{len(ARCHIVE_BYTES)}")
+
+        response = await self.get(self.archivePath, headers={"Range": "bytes=-5"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, ARCHIVE_BYTES[-5:])
+
+    async def test_unsatisfiable_range(self):
+        response = await self.get(self.archivePath, headers={"Range": f"bytes={len(ARCHIVE_BYTES)}-"})
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers["content-range"], f"bytes */{len(ARCHIVE_BYTES)}")
+
+    async def test_malformed_range_sends_whole_file(self):
+        for rangeHeader in ("bytes=abc", "items=0-5", "bytes=0-1,4-5"):
+            response = await self.get(self.archivePath, headers={"Range": rangeHeader})
+            self.assertEqual(response.status_code, 200, rangeHeader)
+            self.assertEqual(response.content, ARCHIVE_BYTES)
+            self.assertNotIn("content-range", response.headers)
+
+    async def test_etag_revalidation(self):
+        etag = (await self.get(self.archivePath)).headers["etag"]
+
+        response = await self.get(self.archivePath, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        # A stale If-Range validator gets the whole file instead of a range of a different version
+        response = await self.get(self.archivePath, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, ARCHIVE_BYTES)
+
+    async def test_path_traversal_is_rejected(self):
+        (self.cacheRoot.parent / f"{self.cacheRoot.name}-secret").write_bytes(b"secret")
+        self.addCleanup((self.cacheRoot.parent / f"{self.cacheRoot.name}-secret").unlink)
+        host, _, port = self.mirrorUrl.removeprefix("http://").partition(":")
+
+        # Sent as raw bytes, since HTTP clients normalise dot segments before sending
+        reader, writer = await asyncio.open_connection(host, int(port))
+        writer.write(f"GET /%2e%2e/{self.cacheRoot.name}-secret HTTP/1.1\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        statusLine = await reader.readline()
+        writer.close()
+
+        self.assertEqual(statusLine.split()[1], b"404")
+
+    async def test_partial_files_are_hidden(self):
+        partialPath = self.templateDir / ("b" * 40) / "template.tar.gz.part"
+        partialPath.parent.mkdir()
+        partialPath.write_bytes(b"partial")
+
+        response = await self.get(f"/{GITHUB_TEMPLATE_PREFIX}/demo/{'b' * 40}/template.tar.gz.part")
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_client_fetches_archive_from_mirror(self):
+        with mock.patch.object(CacheMirrorClient, "mirrorUrl", self.mirrorUrl):
+            self.assertEqual(
+                await CacheMirrorClient.fetchTemplateArchive(templateName="demo", commitSha=COMMIT_SHA), ARCHIVE_BYTES
+            )
+            self.assertIsNone(await CacheMirrorClient.fetchTemplateArchive(templateName="demo", commitSha="b" * 40))
+
+    async def test_client_falls_back_to_github_on_mirror_miss(self):
+        # The codeload stand-in is another mirror server whose files are laid out like codeload URLs
+        codeloadDir = tempfile.TemporaryDirectory()
+        self.addCleanup(codeloadDir.cleanup)
+        missingSha = "b" * 40
+        zipBuffer = BytesIO()
+        with ZipFile(zipBuffer, "w") as zipObj:
+            zipObj.writestr(f"demo-{missingSha}/README.md", "from github\n")
+        zipPath = Path(codeloadDir.name) / "octo" / "demo" / "zip" / missingSha
+        zipPath.parent.mkdir(parents=True)
+        zipPath.write_bytes(zipBuffer.getvalue())
+        codeloadUrl = await self.startServer(cacheRoot=Path(codeloadDir.name))
+
+        with (
+            mock.patch.object(CacheMirrorClient, "mirrorUrl", self.mirrorUrl),
+            mock.patch.object(mappers, "GITHUB_CODELOAD_URL", codeloadUrl),
+        ):
+            zipBytes = await CraftLet.getTemplateBytesGithub(repoUrl="https://github.com/octo/demo", ref=missingSha)
+
+        self.assertEqual(zipBytes, zipBuffer.getvalue())
+
+    async def test_ref_index_is_used_when_github_is_unreachable(self):
+        with socket.socket() as closedSocket:
+            closedSocket.bind(("127.0.0.1", 0))
+            unreachableUrl = f"http://127.0.0.1:{closedSocket.getsockname()[1]}"
+
+        with (
+            mock.patch.object(CacheMirrorClient, "mirrorUrl", self.mirrorUrl),
+            mock.patch.object(mappers, "GITHUB_API_URL", unreachableUrl),
+        ):
+            commitSha = await CraftLet.resolveGithubRef(repoUrl="https://github.com/octo/demo", ref="main")
+
+        self.assertEqual(commitSha, COMMIT_SHA)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import unittest
+
+from readchar import key as rkey
+from rich.console import Console
+
+from craftlet.utils.ui.CliRadioButton import CHROME_HEIGHT, VirtualizedMultiSelect
+
+PLUGIN_NAMES = ["Auth", "Billing", "Auth Admin", "Celery", "Docker", "Email"]
+
+
+def makeSelect(optionNames=PLUGIN_NAMES, height: int = CHROME_HEIGHT + 5):
+    # Rendering is never needed, the console only provides the terminal height
+    richConsole = Console(file=io.StringIO(), height=height, width=80)
+    return VirtualizedMultiSelect(options=[(name, [[name]]) for name in optionNames], title="Plugins", richConsole=richConsole)
+
+
+def pressKeys(select: VirtualizedMultiSelect, keys):
+    return [select.handleKey(key) for key in keys]
+
+
+class VirtualizedMultiSelectTest(unittest.TestCase):
+    def test_space_toggles_current_option(self):
+        select = makeSelect()
+
+        pressKeys(select, [rkey.DOWN, rkey.SPACE])
+        self.assertEqual(select.unSelected, {1})
+        pressKeys(select, [rkey.SPACE])
+        self.assertEqual(select.unSelected, set())
+        self.assertEqual(select.selected, set(range(len(PLUGIN_NAMES))))
+
+    def test_filter_typing_accepts_spaces(self):
+        select = makeSelect()
+
+        pressKeys(select, ["/", *"auth a"])
+
+        self.assertEqual(select.filterQuery, "auth a")
+        self.assertEqual([PLUGIN_NAMES[index] for index in select.filtered], ["Auth Admin"])
+        self.assertEqual(select.unSelected, set())
+
+        # Once the filter is confirmed, Space toggles the match again
+        pressKeys(select, [rkey.ENTER, rkey.SPACE])
+        self.assertFalse(select.isTypingFilter)
+        self.assertEqual(select.unSelected, {2})
+
+    def test_filter_chars_narrow_and_backspace_restores(self):
+        select = makeSelect()
+
+        select.pushFilterChar("A")
+        self.assertEqual([PLUGIN_NAMES[index] for index in select.filtered], ["Auth", "Auth Admin", "Email"])
+        select.pushFilterChar("u")
+        self.assertEqual([PLUGIN_NAMES[index] for index in select.filtered], ["Auth", "Auth Admin"])
+        select.popFilterChar()
+        self.assertEqual(select.filterQuery, "a")
+        self.assertEqual(len(select.filtered), 3)
+        select.popFilterChar()
+        select.popFilterChar()
+        self.assertEqual(select.filterQuery, "")
+        self.assertEqual(select.filtered, list(range(len(PLUGIN_NAMES))))
+
+    def test_escape_clears_filter(self):
+        select = makeSelect()
+
+        pressKeys(select, ["/", *"zzz"])
+        self.assertEqual(select.filtered, [])
+        self.assertIsNone(select.currentIndex)
+        pressKeys(select, [rkey.SPACE, rkey.ESC])
+
+        self.assertFalse(select.isTypingFilter)
+        self.assertEqual(select.filterQuery, "")
+        self.assertEqual(select.filtered, list(range(len(PLUGIN_NAMES))))
+        self.assertEqual(select.unSelected, set())
+
+    def test_window_scrolls_with_cursor(self):
+        select = makeSelect(optionNames=[f"plugin{index}" for index in range(20)])
+        self.assertEqual(select.windowSize, 5)
+
+        pressKeys(select, [rkey.DOWN] * 6)
+        self.assertEqual((select.cursor, select.windowStart), (6, 2))
+        pressKeys(select, [rkey.UP] * 4)
+        self.assertEqual((select.cursor, select.windowStart), (2, 2))
+        pressKeys(select, [rkey.UP])
+        self.assertEqual((select.cursor, select.windowStart), (1, 1))
+
+        # Moving past either end wraps around and brings the cursor back into view
+        pressKeys(select, [rkey.UP, rkey.UP])
+        self.assertEqual((select.cursor, select.windowStart), (19, 15))
+        pressKeys(select, [rkey.DOWN])
+        self.assertEqual((select.cursor, select.windowStart), (0, 0))
+
+    def test_enter_confirms_and_q_deselects_everything(self):
+        select = makeSelect()
+        self.assertEqual(pressKeys(select, [rkey.SPACE, rkey.ENTER]), [True, False])
+        self.assertEqual(select.unSelected, {0})
+
+        select = makeSelect()
+        self.assertEqual(pressKeys(select, ["q"]), [False])
+        self.assertEqual(select.selected, set())
+        self.assertEqual(select.unSelected, set(range(len(PLUGIN_NAMES))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import random
+import unittest
+
+import cbor2
+
+from craftlet.features.DependencyGraphSnapshot import DependencyGraphSnapshot
+from craftlet.utils.exceptions import CraftLetException
+
+
+def bruteForceCycles(edges):
+    # Two modules share a cycle when each reaches the other
+    nodes = {node for edge in edges for node in edge}
+    reachable = {node: set() for node in nodes}
+    for importer, imported in edges:
+        reachable[importer].add(imported)
+    changed = True
+    while changed:
+        changed = False
+        for node in nodes:
+            expanded = reachable[node].union(*(reachable[child] for child in reachable[node]))
+            if expanded != reachable[node]:
+                reachable[node] = expanded
+                changed = True
+    return {
+        frozenset(other for other in nodes if other in reachable[node] and node in reachable[other])
+        for node in nodes
+        if node in reachable[node]
+    }
+
+
+class DependencyGraphSnapshotTest(unittest.TestCase):
+    def test_round_trip(self):
+        edges = {("app.main", "app.db"), ("app.main", "httpx"), ("app.db", "app.models")}
+
+        self.assertEqual(DependencyGraphSnapshot.loads(DependencyGraphSnapshot.dumps(edges)), edges)
+        self.assertEqual(DependencyGraphSnapshot.loads(DependencyGraphSnapshot.dumps(set())), set())
+
+    def test_version_mismatch_is_rejected(self):
+        snapshotBytes = cbor2.dumps({"version": 999, "nodes": [], "edges": []})
+
+        with self.assertRaises(CraftLetException):
+            DependencyGraphSnapshot.loads(snapshotBytes)
+        with self.assertRaises(CraftLetException):
+            DependencyGraphSnapshot.loads(cbor2.dumps(["not", "a", "snapshot"]))
+
+    def test_diff_reports_added_and_removed_edges(self):
+        baselineEdges = {("a", "b"), ("b", "c")}
+        currentEdges = {("a", "b"), ("a", "c"), ("c", "d")}
+
+        diff = DependencyGraphSnapshot.diff(baselineEdges=baselineEdges, currentEdges=currentEdges)
+
+        self.assertEqual(diff.addedEdges, [("a", "c"), ("c", "d")])
+        self.assertEqual(diff.removedEdges, [("b", "c")])
+        self.assertEqual(diff.newCycles, [])
+
+    def test_diff_reports_grown_and_new_cycles(self):
+        baselineEdges = {("a", "b"), ("b", "a"), ("x", "y")}
+        currentEdges = {("a", "b"), ("b", "c"), ("c", "a"), ("x", "y"), ("y", "y")}
+
+        diff = DependencyGraphSnapshot.diff(baselineEdges=baselineEdges, currentEdges=currentEdges)
+
+        self.assertEqual(diff.newCycles, [["a", "b", "c"], ["y"]])
+
+    def test_unchanged_cycle_is_not_new(self):
+        edges = {("a", "b"), ("b", "a")}
+
+        diff = DependencyGraphSnapshot.diff(baselineEdges=edges, currentEdges=edges | {("a", "z")})
+
+        self.assertEqual(diff.newCycles, [])
+
+    def test_find_cycles_matches_brute_force(self):
+        randomGenerator = random.Random(35)
+        for _ in range(200):
+            nodes = [f"m{index}" for index in range(randomGenerator.randint(1, 8))]
+            edges = {
+                (randomGenerator.choice(nodes), randomGenerator.choice(nodes))
+                for _ in range(randomGenerator.randint(0, 16))
+            }
+            self.assertEqual(DependencyGraphSnapshot.findCycles(edges=edges), bruteForceCycles(edges), edges)
+
+
+if __name__ == "__main__":
+    unittest.main()
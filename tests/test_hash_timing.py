@@ -0,0 +1,45 @@
+import tempfile
+import unittest
+from collections import defaultdict
+from pathlib import Path
+from unittest import mock
+
+from craftlet.features.CraftLetCache import CraftLetCache
+from craftlet.features.StagedProjectWriter import StagedProjectWriter
+from craftlet.models.ProjectManifest import ProjectManifest
+from craftlet.utils.profiler import Profiler
+
+
+class HashTimingTest(unittest.TestCase):
+    def setUp(self):
+        workDir = tempfile.TemporaryDirectory()
+        self.addCleanup(workDir.cleanup)
+        self.workDir = Path(workDir.name)
+        for patcher in (
+            mock.patch.object(Profiler, "enabled", True),
+            mock.patch.object(Profiler, "phaseTotals", defaultdict(lambda: [0, 0])),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def hashCalls(self):
+        return Profiler.phaseTotals["hash"][0]
+
+    def test_every_digest_is_timed(self):
+        ProjectManifest.digest(b"data")
+        self.assertEqual(self.hashCalls(), 1)
+
+        (self.workDir / "file.txt").write_bytes(b"data")
+        ProjectManifest.digestFile(filePath=self.workDir / "file.txt")
+        self.assertEqual(self.hashCalls(), 2)
+
+        with StagedProjectWriter(targetDir=self.workDir / "project") as writer:
+            writer.writeText(relativeParts=["README.md"], text="hello\n")
+        self.assertEqual(self.hashCalls(), 3)
+
+        CraftLetCache.writeTemplateArchive(exactPath=self.workDir / "cache", archiveBytes=b"archive")
+        self.assertEqual(self.hashCalls(), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
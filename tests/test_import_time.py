@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+SOURCE_DIR = Path(__file__).resolve().parent.parent / "src"
+HEAVY_MODULES = ("httpx", "rich", "readchar", "asyncio", "tarfile", "cbor2")
+
+
+class ImportTimeTest(unittest.TestCase):
+    def test_startup_skips_heavy_modules(self):
+        environment = {**os.environ, "PYTHONPATH": os.pathsep.join([str(SOURCE_DIR), os.environ.get("PYTHONPATH", "")])}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import craftlet.main"],
+            capture_output=True,
+            text=True,
+            env=environment,
+            check=True,
+        )
+        # Each line reads "import time: <self> | <cumulative> | <indented module name>"
+        importedModules = {
+            line.rsplit("|", 1)[-1].strip() for line in result.stderr.splitlines() if line.startswith("import time:")
+        }
+        self.assertIn("craftlet.main", importedModules)
+        for moduleName in HEAVY_MODULES:
+            loaded = sorted(name for name in importedModules if name == moduleName or name.startswith(moduleName + "."))
+            self.assertEqual(loaded, [], f"{moduleName} is imported at startup")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+from craftlet.models.PathExclusionTrie import PathExclusionTrie
+
+
+class PathExclusionTrieTest(unittest.TestCase):
+    def test_excludes_whole_subtree(self):
+        trie = PathExclusionTrie()
+        trie.addPath("plugins/auth")
+
+        self.assertTrue(trie.isExcluded(["plugins", "auth", "views", "login.py"]))
+        self.assertFalse(trie.isExcluded(["plugins", "billing", "a.py"]))
+        self.assertEqual(trie.paths, ["plugins/auth"])
+
+    def test_empty_module_paths_are_ignored(self):
+        trie = PathExclusionTrie()
+        for path in ("", ".", "./", "/"):
+            trie.addPath(path)
+
+        self.assertEqual(len(trie), 0)
+        self.assertEqual(trie.paths, [])
+        self.assertFalse(trie.isExcluded(["src", "a.py"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import tarfile
+import tempfile
+import time
+import unittest
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+
+from craftlet.features import PipelinedTemplateLoader as pipelinedModule
+from craftlet.features.CacheMirror import CacheMirrorClient, CacheMirrorServer
+from craftlet.features.PipelinedTemplateLoader import PipelinedTemplateLoader
+from craftlet.features.StagedProjectWriter import StagedProjectWriter
+from craftlet.models.PathExclusionTrie import PathExclusionTrie
+from craftlet.models.ProjectManifest import MANIFEST_DIR, ProjectManifest
+from craftlet.utils import mappers
+
+COMMIT_SHA = "c" * 40
+TEMPLATE_CONFIG = {"ProjectPlugin": {"auth": {"about": "Auth", "modulePath": [["plugins", "auth"]]}}}
+
+
+def makeTarball(memberNames):
+    tarBuffer = BytesIO()
+    with tarfile.open(fileobj=tarBuffer, mode="w:gz") as tarObj:
+        for name in memberNames:
+            data = json.dumps(TEMPLATE_CONFIG).encode() if name == "templateConfig.json" else f"{name}\n".encode()
+            tarInfo = tarfile.TarInfo(f"demo-{COMMIT_SHA[:7]}/{name}")
+            tarInfo.size = len(data)
+            tarObj.addfile(tarInfo, BytesIO(data))
+    return tarBuffer.getvalue()
+
+
+def deselectAuth(pluginDict):
+    # A slow answer gives the writers time to run ahead of the selection if they are not held back
+    time.sleep(0.2)
+    exclusions = PathExclusionTrie()
+    exclusions.addPath("plugins/auth")
+    return exclusions
+
+
+class PipelinedTemplateLoaderTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        workDir = tempfile.TemporaryDirectory()
+        self.addCleanup(workDir.cleanup)
+        self.workDir = Path(workDir.name)
+        self.targetDir = self.workDir / "project"
+
+        # Codeload stand-in: a mirror server whose files are laid out like codeload tarball URLs
+        self.codeloadDir = self.workDir / "codeload"
+        self.tarballPath = self.codeloadDir / "octo" / "demo" / "tar.gz" / COMMIT_SHA
+        self.tarballPath.parent.mkdir(parents=True)
+        (self.workDir / "mirror").mkdir()
+        codeloadUrl = await self.startServer(cacheRoot=self.codeloadDir)
+        mirrorUrl = await self.startServer(cacheRoot=self.workDir / "mirror")
+
+        self.writtenPaths = []
+        writeFile = StagedProjectWriter.writeFile
+
+        def recordingWriteFile(writer, relativeParts, data):
+            self.writtenPaths.append(("/").join(relativeParts))
+            writeFile(writer, relativeParts=relativeParts, data=data)
+
+        for patcher in (
+            mock.patch.object(mappers, "GITHUB_CODELOAD_URL", codeloadUrl),
+            # The mirror does not have the commit, so the tarball comes from the codeload stand-in
+            mock.patch.object(CacheMirrorClient, "mirrorUrl", mirrorUrl),
+            mock.patch.object(pipelinedModule, "configureTemplatePlugin", deselectAuth),
+            mock.patch.object(StagedProjectWriter, "writeFile", recordingWriteFile),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def startServer(self, cacheRoot: Path):
+        mirrorServer = CacheMirrorServer(cacheRoot=cacheRoot, host="127.0.0.1", port=0)
+        server = await asyncio.start_server(mirrorServer.handleClient, "127.0.0.1", 0)
+        self.addAsyncCleanup(server.wait_closed)
+        self.addCleanup(server.close)
+        return f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+    async def load(self, memberNames):
+        self.tarballPath.write_bytes(makeTarball(memberNames=memberNames))
+        manifest = ProjectManifest(templateUrl="https://github.com/octo/demo", ref="main", commitSha=COMMIT_SHA)
+        await PipelinedTemplateLoader(
+            repoUrl="https://github.com/octo/demo",
+            ref=COMMIT_SHA,
+            targetDir=self.targetDir,
+            generateEnv=True,
+            manifest=manifest,
+        ).run()
+        return ProjectManifest.load(projectDir=self.targetDir)
+
+    def listProject(self):
+        return sorted(
+            path.relative_to(self.targetDir).as_posix()
+            for path in self.targetDir.rglob("*")
+            if path.is_file() and MANIFEST_DIR not in path.parts
+        )
+
+    async def test_unselected_plugin_after_config_is_never_written(self):
+        manifest = await self.load(
+            memberNames=["templateConfig.json", "README.md", "plugins/auth/a.py", "plugins/auth/b.py", "src/app.py"]
+        )
+
+        self.assertEqual(self.listProject(), [".env", "README.md", "src/app.py"])
+        self.assertFalse(any(path.startswith("plugins/") for path in self.writtenPaths))
+        self.assertEqual(sorted(manifest.files), ["README.md", "src/app.py"])
+        self.assertEqual(manifest.files["src/app.py"], ProjectManifest.digest(b"src/app.py\n"))
+        self.assertEqual(manifest.excludedPaths, ["plugins/auth"])
+        self.assertEqual(manifest.commitSha, COMMIT_SHA)
+
+    async def test_unselected_plugin_before_config_is_pruned(self):
+        # GitHub tarballs list directories before root files, so the config often arrives late
+        manifest = await self.load(memberNames=["plugins/auth/a.py", "src/app.py", "README.md", "templateConfig.json"])
+
+        self.assertIn("plugins/auth/a.py", self.writtenPaths)
+        self.assertEqual(self.listProject(), [".env", "README.md", "src/app.py"])
+        self.assertFalse((self.targetDir / "plugins").exists())
+        self.assertEqual(sorted(manifest.files), ["README.md", "src/app.py"])
+        self.assertFalse(self.targetDir.with_name(f".{self.targetDir.name}.craftlet-staging").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+from zipfile import ZipFile
+
+from craftlet.features.CacheMirror import CacheMirrorClient
+from craftlet.features.CraftLet import CraftLet
+from craftlet.features.CraftLetCache import CraftLetCache
+from craftlet.features.ProjectUpdate import CONFLICT_SUFFIX, ProjectUpdate
+from craftlet.models.ProjectManifest import ProjectManifest
+from craftlet.utils import mappers
+
+TEMPLATE_URL = "https://github.com/octo/demo"
+TEMPLATE_VERSIONS = {
+    "1" * 40: {
+        "README.md": "hello\n",
+        "src/app.py": "print(1)\n",
+        "src/keep.py": "keep\n",
+        "old.txt": "old\n",
+        "notes.txt": "notes\n",
+    },
+    "2" * 40: {
+        "README.md": "hello v2\n",
+        "src/app.py": "print(2)\n",
+        "src/keep.py": "keep\n",
+        "new.txt": "new\n",
+    },
+}
+
+
+def makeZip(commitSha: str):
+    zipBuffer = BytesIO()
+    with ZipFile(zipBuffer, "w") as zipObj:
+        for relativePath, text in TEMPLATE_VERSIONS[commitSha].items():
+            zipObj.writestr(f"demo-{commitSha}/{relativePath}", text)
+    return zipBuffer.getvalue()
+
+
+class GithubStandIn(BaseHTTPRequestHandler):
+    # "main" points at whichever commit the test moved it to
+    mainCommitSha = "1" * 40
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        ref = self.path.rsplit("/", 1)[-1]
+        if self.path == "/repos/octo/demo/commits/main":
+            body = GithubStandIn.mainCommitSha.encode()
+        elif self.path.startswith("/octo/demo/zip/") and ref in TEMPLATE_VERSIONS:
+            body = makeZip(commitSha=ref)
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ProjectUpdateTest(unittest.TestCase):
+    def setUp(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), GithubStandIn)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        GithubStandIn.mainCommitSha = "1" * 40
+
+        serverUrl = f"http://127.0.0.1:{server.server_address[1]}"
+        workDir = tempfile.TemporaryDirectory()
+        self.addCleanup(workDir.cleanup)
+        for patcher in (
+            mock.patch.object(mappers, "GITHUB_API_URL", serverUrl),
+            mock.patch.object(mappers, "GITHUB_CODELOAD_URL", serverUrl),
+            mock.patch.object(CacheMirrorClient, "mirrorUrl", None),
+            mock.patch.object(CraftLetCache, "getCacheBasePath", return_value=Path(workDir.name) / "cache"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.projectDir = Path(workDir.name) / "project"
+        CraftLet.diskWrite(
+            inputBytes=makeZip(commitSha="1" * 40),
+            targetDestination=self.projectDir,
+            generateEnv=False,
+            manifest=ProjectManifest(templateUrl=TEMPLATE_URL, ref="main", commitSha="1" * 40),
+        )
+        GithubStandIn.mainCommitSha = "2" * 40
+
+    def update(self, dryRun: bool = False):
+        return asyncio.run(
+            ProjectUpdate.updateProject(projectDir=self.projectDir, ref=None, templateUrl=None, dryRun=dryRun)
+        )
+
+    def test_update_outcomes(self):
+        (self.projectDir / "src" / "app.py").write_text("print('mine')\n")
+        (self.projectDir / "notes.txt").write_text("my notes\n")
+        os.utime(self.projectDir / "src" / "keep.py", ns=(0, 0))
+
+        commitSha, report = self.update()
+
+        self.assertEqual(commitSha, "2" * 40)
+        # Unchanged template files are settled from the manifest
+        self.assertNotIn("src/keep.py", report.updated + report.added)
+        self.assertEqual((self.projectDir / "src" / "keep.py").stat().st_mtime_ns, 0)
+        self.assertEqual(report.updated, ["README.md"])
+        self.assertEqual((self.projectDir / "README.md").read_text(), "hello v2\n")
+        self.assertEqual(report.added, ["new.txt"])
+        self.assertEqual((self.projectDir / "new.txt").read_text(), "new\n")
+        self.assertEqual(report.removed, ["old.txt"])
+        self.assertFalse((self.projectDir / "old.txt").exists())
+        self.assertEqual(
+            report.conflicts,
+            [("src/app.py", "modified locally"), ("notes.txt", "removed from the template but modified locally")],
+        )
+        self.assertEqual((self.projectDir / "src" / "app.py").read_text(), "print('mine')\n")
+        self.assertEqual((self.projectDir / "src" / f"app.py{CONFLICT_SUFFIX}").read_text(), "print(2)\n")
+        self.assertEqual((self.projectDir / "notes.txt").read_text(), "my notes\n")
+        self.assertFalse((self.projectDir / f"notes.txt{CONFLICT_SUFFIX}").exists())
+        self.assertEqual(report.sidecars, ["src/app.py"])
+        self.assertEqual(ProjectManifest.load(projectDir=self.projectDir).commitSha, "2" * 40)
+
+        self.assertEqual(self.update(), ("2" * 40, None))
+
+    def test_dry_run_writes_nothing(self):
+        (self.projectDir / "src" / "app.py").write_text("print('mine')\n")
+        manifestBytes = (self.projectDir / ".craftlet" / "manifest.cbor").read_bytes()
+        projectBefore = {path: path.read_bytes() for path in self.projectDir.rglob("*") if path.is_file()}
+
+        _, report = self.update(dryRun=True)
+
+        self.assertEqual(report.updated, ["README.md"])
+        self.assertEqual(report.sidecars, [])
+        projectAfter = {path: path.read_bytes() for path in self.projectDir.rglob("*") if path.is_file()}
+        self.assertEqual(projectAfter, projectBefore)
+        self.assertEqual((self.projectDir / ".craftlet" / "manifest.cbor").read_bytes(), manifestBytes)
+
+
+if __name__ == "__main__":
+    unittest.main()
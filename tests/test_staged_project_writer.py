@@ -0,0 +1,103 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from craftlet.features.StagedProjectWriter import JOURNAL_NAME, StagedProjectWriter
+from craftlet.utils.exceptions import CraftLetException
+
+
+class StagedProjectWriterTest(unittest.TestCase):
+    def setUp(self):
+        workDir = tempfile.TemporaryDirectory()
+        self.addCleanup(workDir.cleanup)
+        self.targetDir = Path(workDir.name) / "project"
+
+    def listProject(self):
+        return sorted(path.relative_to(self.targetDir).as_posix() for path in self.targetDir.rglob("*") if path.is_file())
+
+    def interruptedWrite(self, files):
+        with self.assertRaises(KeyboardInterrupt):
+            with StagedProjectWriter(targetDir=self.targetDir) as writer:
+                for relativeParts, text in files:
+                    writer.writeText(relativeParts=relativeParts, text=text)
+                raise KeyboardInterrupt
+        return writer
+
+    def test_commit_moves_staging_into_place(self):
+        with StagedProjectWriter(targetDir=self.targetDir) as writer:
+            writer.writeText(relativeParts=["README.md"], text="hello\n")
+            writer.writeText(relativeParts=["src", "app.py"], text="print(1)\n")
+            self.assertFalse(self.targetDir.exists())
+
+        self.assertEqual(self.listProject(), ["README.md", "src/app.py"])
+        self.assertFalse(writer.stagingDir.exists())
+
+    def test_interrupted_write_resumes(self):
+        writer = self.interruptedWrite(files=[(["README.md"], "hello\n"), (["src", "app.py"], "print(1)\n")])
+        self.assertFalse(self.targetDir.exists())
+        self.assertTrue((writer.stagingDir / JOURNAL_NAME).is_file())
+
+        with StagedProjectWriter(targetDir=self.targetDir) as resumedWriter:
+            resumedWriter.writeText(relativeParts=["README.md"], text="hello\n")
+            # Changed content is written again instead of being skipped
+            resumedWriter.writeText(relativeParts=["src", "app.py"], text="print(2)\n")
+
+        self.assertEqual(resumedWriter.resumedCount, 1)
+        self.assertEqual((self.targetDir / "src" / "app.py").read_text(), "print(2)\n")
+        self.assertFalse(resumedWriter.stagingDir.exists())
+
+    def test_resume_drops_files_no_longer_wanted(self):
+        self.interruptedWrite(files=[(["README.md"], "hello\n"), (["plugins", "auth", "a.py"], "x = 1\n")])
+
+        with StagedProjectWriter(targetDir=self.targetDir) as resumedWriter:
+            resumedWriter.writeText(relativeParts=["README.md"], text="hello\n")
+
+        self.assertEqual(self.listProject(), ["README.md"])
+        self.assertFalse((self.targetDir / "plugins").exists())
+
+    def test_unjournaled_files_are_removed_after_a_hard_crash(self):
+        crashedWriter = StagedProjectWriter(targetDir=self.targetDir).__enter__()
+        crashedWriter.writeText(relativeParts=["README.md"], text="hello\n")
+        crashedWriter.writeText(relativeParts=["stray", "deep", "x.txt"], text="x\n")
+        # A hard crash never reaches __exit__, so the pending batch is never journaled
+        crashedWriter.journal.close()
+
+        with StagedProjectWriter(targetDir=self.targetDir) as resumedWriter:
+            resumedWriter.writeText(relativeParts=["README.md"], text="hello\n")
+
+        self.assertEqual(resumedWriter.resumedCount, 0)
+        self.assertEqual(self.listProject(), ["README.md"])
+
+    def test_torn_journal_line_is_ignored(self):
+        writer = self.interruptedWrite(files=[(["README.md"], "hello\n"), (["LICENSE"], "MIT\n")])
+        journalPath = writer.stagingDir / JOURNAL_NAME
+        journalText = journalPath.read_text()
+        # Cut the last entry in half, as a crash during the journal append would
+        journalPath.write_text(journalText[: journalText.rindex("\t") + 3])
+
+        self.assertEqual(list(StagedProjectWriter.readJournal(journalPath=journalPath)), ["README.md"])
+        with StagedProjectWriter(targetDir=self.targetDir) as resumedWriter:
+            resumedWriter.writeText(relativeParts=["README.md"], text="hello\n")
+            resumedWriter.writeText(relativeParts=["LICENSE"], text="MIT\n")
+
+        self.assertEqual(resumedWriter.resumedCount, 1)
+        self.assertEqual(self.listProject(), ["LICENSE", "README.md"])
+
+    def test_existing_project_is_refused(self):
+        self.targetDir.mkdir()
+        (self.targetDir / "keep.txt").write_text("mine\n")
+
+        with self.assertRaises(CraftLetException):
+            StagedProjectWriter(targetDir=self.targetDir).__enter__()
+
+    def test_durable_mode_is_per_writer(self):
+        with StagedProjectWriter(targetDir=self.targetDir, durable=True) as writer:
+            writer.writeText(relativeParts=["src", "app.py"], text="print(1)\n")
+
+        self.assertTrue(writer.durable)
+        self.assertFalse(StagedProjectWriter(targetDir=self.targetDir.with_name("other")).durable)
+        self.assertEqual(self.listProject(), ["src/app.py"])
+
+
+if __name__ == "__main__":
+    unittest.main()
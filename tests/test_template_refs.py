@@ -0,0 +1,175 @@
+import asyncio
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+from zipfile import ZipFile
+
+from craftlet.features.CacheMirror import CacheMirrorClient
+from craftlet.features.CraftLetCache import CraftLetCache
+from craftlet.models.Cacheable import GithubTemplate, GithubTemplateReference
+from craftlet.utils import mappers
+
+TEMPLATE_URL = "https://github.com/octo/demo"
+REF_COMMITS = {"main": "a" * 40, "dev": "b" * 40}
+
+
+class GithubStandIn(BaseHTTPRequestHandler):
+    # Answers the commits API and codeload zip endpoints the way GitHub does for REF_COMMITS
+    requestedPaths = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        GithubStandIn.requestedPaths.append(self.path)
+        ref = self.path.rsplit("/", 1)[-1]
+        if self.path.startswith("/repos/octo/demo/commits/") and ref in REF_COMMITS:
+            body = REF_COMMITS[ref].encode()
+        elif self.path.startswith("/octo/demo/zip/") and ref in REF_COMMITS.values():
+            zipBuffer = BytesIO()
+            with ZipFile(zipBuffer, "w") as zipObj:
+                zipObj.writestr(f"demo-{ref}/README.md", f"commit {ref}\n")
+            body = zipBuffer.getvalue()
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TemplateRefCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), GithubStandIn)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        GithubStandIn.requestedPaths = []
+
+        serverUrl = f"http://127.0.0.1:{self.server.server_address[1]}"
+        cacheDir = tempfile.TemporaryDirectory()
+        self.addCleanup(cacheDir.cleanup)
+        self.cacheBasePath = Path(cacheDir.name)
+        for patcher in (
+            mock.patch.object(mappers, "GITHUB_API_URL", serverUrl),
+            mock.patch.object(mappers, "GITHUB_CODELOAD_URL", serverUrl),
+            mock.patch.object(CacheMirrorClient, "mirrorUrl", None),
+            mock.patch.object(CraftLetCache, "getCacheBasePath", return_value=self.cacheBasePath),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.templateDir = CraftLetCache.getGithubTemplateDir(path=self.cacheBasePath, templateName="demo")
+
+    def cacheTemplate(self, ref: str):
+        # Same steps as the cache-template command
+        commitSha, templateBytes, _ = asyncio.run(
+            CraftLetCache.fetchGithubTemplateForCache(templateUrl=TEMPLATE_URL, templateName="demo", ref=ref)
+        )
+        if templateBytes is not None:
+            CraftLetCache.cacheGithubTemplate(
+                data=GithubTemplate(
+                    name="demo",
+                    coreData=templateBytes,
+                    dataVersion=1,
+                    payload={"ownerName": "octo", "template_url": TEMPLATE_URL, "ref": ref, "commitSha": commitSha},
+                ),
+                path=self.cacheBasePath,
+            )
+        return commitSha
+
+    def test_cached_full_sha_makes_no_request(self):
+        commitSha = self.cacheTemplate(ref="main")
+        GithubStandIn.requestedPaths = []
+
+        cachedSha, templateBytes, cacheStatus = asyncio.run(
+            CraftLetCache.fetchGithubTemplateForCache(templateUrl=TEMPLATE_URL, templateName="demo", ref=commitSha.upper())
+        )
+
+        self.assertEqual(cachedSha, commitSha)
+        self.assertIsNone(templateBytes)
+        self.assertEqual(cacheStatus, "is already cached")
+        self.assertEqual(GithubStandIn.requestedPaths, [])
+
+    def test_branch_is_resolved_once_then_served_from_cache(self):
+        commitSha = self.cacheTemplate(ref="main")
+        self.assertEqual(commitSha, REF_COMMITS["main"])
+        self.assertEqual(
+            GithubStandIn.requestedPaths, ["/repos/octo/demo/commits/main", f"/octo/demo/zip/{commitSha}"]
+        )
+        self.assertTrue((self.templateDir / commitSha / "template.tar.gz").is_file())
+        self.assertEqual(CraftLetCache.readGithubRefIndex(templateDir=self.templateDir), {"main": commitSha})
+        GithubStandIn.requestedPaths = []
+
+        # Offline lookups go through refs.cbor, and caching the branch again skips the download
+        self.assertEqual(
+            CraftLetCache.resolveCachedTemplateRef(templateDir=self.templateDir, ref="main"), self.templateDir / commitSha
+        )
+        self.assertEqual(GithubStandIn.requestedPaths, [])
+        self.cacheTemplate(ref="main")
+        self.assertEqual(GithubStandIn.requestedPaths, ["/repos/octo/demo/commits/main"])
+
+    def test_refs_do_not_overwrite_each_other(self):
+        mainSha = self.cacheTemplate(ref="main")
+        devSha = self.cacheTemplate(ref="dev")
+
+        self.assertNotEqual(mainSha, devSha)
+        self.assertEqual(CraftLetCache.readGithubRefIndex(templateDir=self.templateDir), {"main": mainSha, "dev": devSha})
+        for ref, commitSha in (("main", mainSha), ("dev", devSha)):
+            exactPath = CraftLetCache.resolveCachedTemplateRef(templateDir=self.templateDir, ref=ref)
+            self.assertEqual(exactPath, self.templateDir / commitSha)
+            self.assertTrue((exactPath / "template.tar.gz").is_file())
+
+    def test_legacy_entry_only_answers_when_no_ref_is_requested(self):
+        # A template cached before the commit keyed layout sits directly in the template directory
+        self.templateDir.mkdir(parents=True)
+        (self.templateDir / "template.tar.gz").write_bytes(b"legacy")
+
+        self.assertEqual(CraftLetCache.resolveCachedTemplateRef(templateDir=self.templateDir, ref=None), self.templateDir)
+        for ref in ("main", "dev", "c" * 40):
+            self.assertIsNone(CraftLetCache.resolveCachedTemplateRef(templateDir=self.templateDir, ref=ref))
+
+        devSha = self.cacheTemplate(ref="dev")
+        self.assertIsNone(CraftLetCache.resolveCachedTemplateRef(templateDir=self.templateDir, ref=None))
+        self.assertEqual(
+            CraftLetCache.resolveCachedTemplateRef(templateDir=self.templateDir, ref="dev"), self.templateDir / devSha
+        )
+
+    def cacheReference(self, ref: str):
+        CraftLetCache.cacheGithubTemplateRefrence(
+            data=GithubTemplateReference(name="demo", coreData=TEMPLATE_URL, payload={"ownerName": "octo", "ref": ref}),
+            path=self.cacheBasePath,
+        )
+
+    def test_reference_is_promoted_at_the_requested_ref(self):
+        self.cacheReference(ref="main")
+
+        exactPath = asyncio.run(
+            CraftLetCache.promoteGithubTemplateReference(path=self.cacheBasePath, templateName="demo", ref="dev")
+        )
+
+        self.assertEqual(exactPath, self.templateDir / REF_COMMITS["dev"])
+        self.assertEqual(CraftLetCache.readGithubRefIndex(templateDir=self.templateDir), {"dev": REF_COMMITS["dev"]})
+        # The reference still answers for the ref it was saved with
+        reference = CraftLetCache.readGithubTemplateReference(path=self.cacheBasePath, templateName="demo")
+        self.assertEqual(reference.payload["ref"], "main")
+
+    def test_reference_is_promoted_at_its_recorded_ref(self):
+        self.cacheReference(ref="main")
+
+        exactPath = asyncio.run(
+            CraftLetCache.promoteGithubTemplateReference(path=self.cacheBasePath, templateName="demo")
+        )
+
+        self.assertEqual(exactPath, self.templateDir / REF_COMMITS["main"])
+        self.assertIsNone(CraftLetCache.readGithubTemplateReference(path=self.cacheBasePath, templateName="demo"))
+
+
+if __name__ == "__main__":
+    unittest.main()